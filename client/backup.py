@@ -6,6 +6,7 @@ import time
 from game import WerewolfGame
 from models import Player
 from events import DayEvent, NightEvent
+from protocol import encode_message, FrameDecoder
 
 class GameServer:
     def __init__(self, host='localhost', port=5000):
@@ -15,6 +16,8 @@ class GameServer:
         self.game = WerewolfGame()
         self.players = []
         self.client_sockets = []
+        self.decoders = [FrameDecoder(), FrameDecoder()]
+        self.inboxes = [[], []]
         self.vote_lock = threading.Lock()
 
 
@@ -64,7 +67,7 @@ class GameServer:
     def broadcast_message(self, message):
         for sc in self.client_sockets:
             try:
-                sc.send(json.dumps(message).encode())
+                sc.sendall(encode_message(message))
             except:
                 print("发送消息失败")
                 
@@ -214,13 +217,19 @@ class GameServer:
     
     def send_message(self, message, player_index):
         try:
-            self.client_sockets[player_index].send(json.dumps(message).encode())
+            self.client_sockets[player_index].sendall(encode_message(message))
         except:
             print("发送消息失败")
         
     def receive_message(self, player_index):
         try:
-            return json.loads(self.client_sockets[player_index].recv(1024).decode())
+            inbox = self.inboxes[player_index]
+            while not inbox:
+                data = self.client_sockets[player_index].recv(4096)
+                if not data:
+                    return {}
+                inbox.extend(self.decoders[player_index].feed(data))
+            return inbox.pop(0)
         except json.JSONDecodeError:
             print("接收消息失败: JSON解码错误")
             return {}
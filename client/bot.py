@@ -0,0 +1,162 @@
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from client import GameClient
+
+# 复用服务端 roles.py 中的 AI 决策，客户端目录与服务端目录并列
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "server"))
+from roles import ROLES, WitchState
+
+
+class SeatView:
+    """
+    机器人视角下的玩家：只包含提示消息里公开的信息，供 roles.py 的 AI 决策使用
+    """
+    __slots__ = ("name", "alive", "wolf", "is_ai", "state")
+
+    def __init__(self, name, alive=True, wolf=False):
+        self.name = name
+        self.alive = alive
+        self.wolf = wolf
+        self.is_ai = True
+        self.state = None
+
+    def is_wolf(self):
+        return self.wolf
+
+
+class RolePolicy:
+    """
+    按服务端 AI 的规则作答：夜间行动交给 roles.py 中对应角色的决策，
+    投票在候选人中随机选择（与 game.py 中 AI 投票相同）。
+    think 为每次作答前的思考时间上限（秒），用于模拟真人的响应延迟
+    """
+    def __init__(self, think=0.0, rng=None):
+        self.think = think
+        self.rng = rng or random.Random()
+
+    def answer(self, message, client):
+        if self.think:
+            time.sleep(self.rng.uniform(0, self.think))
+        message_type = message.get("type")
+        if message_type == "wait_confirm":
+            return {"confirm": True}
+        if message_type in ("sheriff_election", "day_vote"):
+            return self.vote(message, client)
+        if message_type == "night_action":
+            return self.night_action(message, client)
+        return {}
+
+    def vote(self, message, client):
+        candidates = [name for name in message["candidates"] if name != client.name]
+        candidates = candidates or message["candidates"]
+        return {"vote": self.rng.choice(candidates)} if candidates else {}
+
+    def night_action(self, message, client):
+        action = message["action"]
+        me = SeatView(client.name, alive=action != "hunter", wolf=action == "werewolf")
+        if action == "witch":
+            me.state = WitchState()
+            me.state.has_antidote = message.get("has_antidote", False)
+            me.state.has_poison = message.get("has_poison", False)
+            me.state.victim = message.get("wolf_target")
+            seats = [me] + [SeatView(name) for name in message["alive_players"]]
+            decision = ROLES["女巫"].night_action(me, seats, self.rng) or {}
+            if decision.get("action") == "save":
+                return {"save": decision["target"], "poison": None}
+            if decision.get("action") == "poison":
+                return {"save": None, "poison": decision["target"]}
+            return {"save": None, "poison": None}
+
+        candidates = message["candidates"]
+        seats = [SeatView(name) for name in candidates]
+        if action == "werewolf":
+            decision = ROLES["狼人"].night_action(me, seats, self.rng) or {}
+            target = decision.get("vote")
+        elif action == "seer":
+            target = (ROLES["预言家"].night_action(me, seats, self.rng) or {}).get("target")
+        elif action == "hunter":
+            target = (ROLES["猎人"].day_action(me, seats, self.rng) or {}).get("target")
+        else:
+            target = None
+        if target is None and candidates:
+            target = self.rng.choice(candidates)
+        return {"target": target} if target is not None else {}
+
+
+def quiet(*args, **kwargs):
+    pass
+
+
+class BotStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.games = 0
+        self.errors = 0
+
+    def add(self, field):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+
+def run_bot(host, port, name, room_size, codec, policy, games, verbose, results):
+    for _ in range(games):
+        try:
+            client = GameClient(host, port, room_size, codec, name=name, policy=policy)
+        except OSError:
+            results.add("errors")
+            return
+        if not verbose:
+            client.log = quiet
+        client.start()
+        client.client.close()
+        results.add("games")
+
+
+def run_bots(host, port, count, room_size=None, codec="binary", think=0.0, games=1, seed=None,
+             verbose=False, prefix="bot"):
+    """
+    在同一进程中启动 count 个机器人，每个机器人连续参加 games 局后退出
+    """
+    results = BotStats()
+    threads = []
+    for i in range(count):
+        rng = random.Random(None if seed is None else seed + i)
+        policy = RolePolicy(think, rng)
+        thread = threading.Thread(target=run_bot, daemon=True,
+                                  args=(host, port, f"{prefix}{i}", room_size, codec, policy,
+                                        games, verbose, results))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无界面机器人客户端，用于填补空座或线上冒烟测试")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--bots", type=int, default=1, help="同一进程中运行的机器人数")
+    parser.add_argument("--room-size", type=int, help="请求的房间人数（仅 asyncio 服务端）")
+    parser.add_argument("--codec", choices=["json", "binary"], default="binary")
+    parser.add_argument("--think", type=float, default=0.0, help="每次作答前的最长思考时间（秒）")
+    parser.add_argument("--games", type=int, default=1, help="每个机器人连续参加的局数")
+    parser.add_argument("--seed", type=int, help="机器人决策的随机种子")
+    parser.add_argument("--prefix", default="bot", help="机器人名字前缀")
+    parser.add_argument("--verbose", action="store_true", help="打印每个机器人收到的消息")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_bots(args.host, args.port, args.bots, args.room_size, args.codec, args.think,
+                       args.games, args.seed, args.verbose, args.prefix)
+    elapsed = time.perf_counter() - start
+    print(f"{args.bots} 个机器人完成 {results.games} 局（按机器人计），"
+          f"连接失败 {results.errors} 次，用时 {elapsed:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,156 +1,297 @@
+import os
+import queue
 import socket
-import json
+import sys
+import threading
+import time
 
-def display_game_status(status):
-    print("\n=== 游戏状态 ===")
-    print(f"你的角色: {status['role']}")
-    print(f"当前天数: {status['day_count']}")
-    print("\n玩家状态:")
+# 通信协议与服务端共用 server/protocol.py，两端的编码表必须完全一致；客户端目录与服务端目录并列
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "server"))
+from protocol import encode_message, FrameDecoder
+
+# 断线后重连的尝试次数与间隔（秒），总时长与服务端的宽限期一致
+RECONNECT_ATTEMPTS = 30
+RECONNECT_INTERVAL = 2.0
+
+def display_game_status(status, log=print):
+    log("\n=== 游戏状态 ===")
+    log(f"你的角色: {status['role']}")
+    log(f"当前天数: {status['day_count']}")
+    log("\n玩家状态:")
     for name, role, alive, is_sheriff in status["players"]:
         status_str = "存活" if alive else "已死亡"
         sheriff_str = "(警长)" if is_sheriff else ""
-        print(f"{name}: {role} - {status_str} {sheriff_str}")
-    print()
+        log(f"{name}: {role} - {status_str} {sheriff_str}")
+    log()
+
+def apply_status_delta(status, delta):
+    for change in delta["changes"]:
+        if change[0] == "alive":
+            status["players"][change[1]][2] = change[2]
+        elif change[0] == "sheriff":
+            status["players"][change[1]][3] = change[2]
+        elif change[0] == "day_count":
+            status["day_count"] = change[1]
+    status["version"] = delta["version"]
 
 class GameClient:
-    def __init__(self, host='localhost', port=5000):
+    """
+    客户端：后台线程分别读取网络消息和键盘输入，统一放入事件队列由主线程处理。
+    等待输入时网络消息照常接收和显示；每个提示是一个生成器，逐行接收输入，
+    校验通过后生成回复，新提示到达时旧提示作废。
+    传入 policy 时以无界面机器人模式运行，所有提示由 policy 直接作答
+    """
+    def __init__(self, host='localhost', port=5000, room_size=None, codec="binary", name=None, policy=None):
+        self.host = host
+        self.port = port
+        self.room_size = room_size
+        self.codec = codec
         self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.client.connect((host, port))
+        self.decoder = FrameDecoder()
+        self.events = queue.Queue()
+        self.status = None
+        self.name = name
+        self.policy = policy
+        # 输出函数，机器人模式下可替换为空函数
+        self.log = print
+        # 服务端在 welcome 中下发的会话令牌，断线后凭它重连回原座位
+        self.token = None
+        # 正在等待输入的提示（生成器）及其原始消息
+        self.prompt = None
+        self.prompt_message = None
 
     def start(self):
-        name = input("请输入你的名字: ")
-        self.send_message({"name": name})
+        if self.name is None:
+            self.name = input("请输入你的名字: ")
+        name = self.name
+        # 请求使用的编码，服务端不支持时回退到 JSON，以 welcome 消息为准
+        hello = {"name": name, "codec": self.codec}
+        if self.room_size:
+            hello["room_size"] = self.room_size
+        self.send_message(hello)
+        self.start_receiver()
+        if self.policy is None:
+            threading.Thread(target=self.input_loop, daemon=True).start()
 
         while True:
-            message = self.receive_message()
-            if not message:
-                print("连接断开")
+            kind, item = self.events.get()
+            if kind == "input":
+                self.handle_input(item)
+                continue
+
+            if not item:
+                if self.reconnect():
+                    continue
+                self.log("连接断开")
                 break
 
-            if not self.handle_message(message):
+            if not self.handle_message(item):
                 break
 
+    def start_receiver(self):
+        threading.Thread(target=self.receive_loop, args=(self.client, self.decoder), daemon=True).start()
+
+    def receive_loop(self, client, decoder):
+        while True:
+            try:
+                data = client.recv(4096)
+                messages = decoder.feed(data) if data else None
+            except (OSError, ValueError):
+                messages = None
+            if messages is None:
+                # 重连后旧连接的读取线程直接退出，不再报告断线
+                if client is self.client:
+                    self.events.put(("message", None))
+                return
+            for message in messages:
+                self.events.put(("message", message))
+
+    def input_loop(self):
+        for line in sys.stdin:
+            self.events.put(("input", line.strip()))
+
+    def handle_input(self, line):
+        if self.prompt is None:
+            self.log("当前没有需要回答的问题")
+            return
+        self.advance(line)
+
+    def begin_prompt(self, message, prompt):
+        if self.policy is not None:
+            self.reply(message, self.policy.answer(message, self))
+            return
+        if self.prompt is not None:
+            self.log("\n上一个问题已超时作废")
+        self.prompt = prompt
+        self.prompt_message = message
+        self.advance(None)
+
+    def advance(self, answer):
+        # 把一行输入交给当前提示；提示结束时发送它生成的回复，否则显示下一个问题
+        try:
+            question = self.prompt.send(answer)
+        except StopIteration as done:
+            message = self.prompt_message
+            self.prompt = self.prompt_message = None
+            self.reply(message, done.value)
+            return
+        self.log(question, end="", flush=True)
+
+    def choose(self, question, options, optional=False):
+        while True:
+            answer = yield question
+            if optional and answer == "none":
+                return None
+            if answer in options:
+                return answer
+            self.log("无效的选择，请重新输入")
+
+    def confirm_prompt(self):
+        while True:
+            answer = (yield "是否准备好开始游戏？(yes/no): ").lower()
+            if answer in ['yes', 'no']:
+                return {"confirm": answer == 'yes'}
+            self.log("无效的输入，请输入 yes 或 no")
+
+    def vote_prompt(self, message):
+        vote = yield from self.choose("请选择要投票的玩家: ", message["candidates"])
+        return {"vote": vote}
+
+    def target_prompt(self, message, question):
+        target = yield from self.choose(question, message["candidates"])
+        return {"target": target}
+
+    def witch_prompt(self, message):
+        save = poison = None
+        if message.get("has_antidote") and message.get("wolf_target"):
+            self.log("今晚被狼人击杀的玩家:", message["wolf_target"])
+            save = yield from self.choose("输入该玩家名字使用解药（或输入 'none' 跳过）: ",
+                                          [message["wolf_target"]], optional=True)
+        if message.get("has_poison"):
+            self.log("你可以使用毒药毒杀一名玩家。")
+            self.log("存活的玩家:", message["alive_players"])
+            poison = yield from self.choose("请输入要毒杀的玩家名字（或输入 'none' 跳过）: ",
+                                            message["alive_players"], optional=True)
+        return {"save": save, "poison": poison}
+
     def handle_message(self, message):
         message_type = message.get("type")
 
-        if message_type == "wait_confirm":
-            print("\n=== 等待游戏确认 ===")
-            print("已连接的玩家:", message["players"])
-            while True:
-                confirm = input("是否准备好开始游戏？(yes/no): ").lower()
-                if confirm in ['yes', 'no']:
-                    self.send_message({"confirm": confirm == 'yes'})
-                    break
-                print("无效的输入，请输入 yes 或 no")
+        if message_type == "welcome":
+            self.token = message.get("token")
+            if message.get("resumed"):
+                self.log("\n已重新连接，恢复游戏")
+
+        elif message_type == "reconnect_rejected":
+            self.log("重连失败：座位已失效")
+            return False
+
+        elif message_type == "wait_confirm":
+            self.log("\n=== 等待游戏确认 ===")
+            self.log("已连接的玩家:", message["players"])
+            self.begin_prompt(message, self.confirm_prompt())
+
+        elif message_type == "room_joined":
+            self.log(f"\n已加入房间 {message['room']} ({len(message['players'])}/{message['size']})")
 
         elif message_type == "game_cancelled":
-            print("游戏已取消")
+            self.log("游戏已取消")
             return False
 
         elif message_type == "game_status":
-            display_game_status(message)
+            # 快照中自己那一行的身份不随类别共享部分下发，按座位填回
+            if "seat" in message:
+                message["players"][message["seat"]][1] = message["role"]
+            self.status = message
+            display_game_status(message, self.log)
+
+        elif message_type == "status_delta":
+            # 快照已包含的增量直接忽略；版本不连续时丢弃增量，向服务端请求完整快照
+            if self.status is not None and message["version"] <= self.status.get("version", -1):
+                pass
+            elif self.status is None or message["base"] != self.status.get("version"):
+                self.status = None
+                self.send_message({"type": "resync"})
+            else:
+                apply_status_delta(self.status, message)
+                display_game_status(self.status, self.log)
 
         elif message_type == "game_end":
-            print("游戏结束")
+            self.log("游戏结束")
             return False
 
         elif message_type == "sheriff_election":
-            print("\n=== 警长选举 ===")
-            print("可投票的玩家:", message["candidates"])
-            while True:
-                vote = input("请选择要投票的玩家: ")
-                if vote in message["candidates"]:
-                    self.send_message({"vote": vote})
-                    break
-                print("无效的选择，请重新输入")
+            self.log("\n=== 警长选举 ===")
+            self.log("可投票的玩家:", message["candidates"])
+            self.begin_prompt(message, self.vote_prompt(message))
 
         elif message_type == "day_vote":
-            print("\n=== 白天投票 ===")
-            print("可投票的玩家:", message["candidates"])
-            while True:
-                vote = input("请选择要投票的玩家: ")
-                if vote in message["candidates"]:
-                    self.send_message({"vote": vote})
-                    break
-                print("无效的选择，请重新输入")
+            self.log("\n=== 白天投票 ===")
+            self.log("可投票的玩家:", message["candidates"])
+            self.begin_prompt(message, self.vote_prompt(message))
 
         elif message_type == "night_action":
             action = message.get("action")
             if action == "werewolf":
-                print("\n=== 狼人行动 ===")
-                print("可选择的目标:", message["candidates"])
-                while True:
-                    target = input("请选择要击杀的玩家: ")
-                    if target in message["candidates"]:
-                        self.send_message({"target": target})
-                        break
-                    print("无效的选择，请重新输入")
+                self.log("\n=== 狼人行动 ===")
+                self.log("可选择的目标:", message["candidates"])
+                self.begin_prompt(message, self.target_prompt(message, "请选择要击杀的玩家: "))
 
             elif action == "witch":
-                print("\n=== 女巫行动 ===")
-                if message.get("has_antidote"):
-                    print("你可以使用解药拯救一名玩家。")
-                    print("死亡的玩家:", message["dead_players"])
-                    save = input("请输入要拯救的玩家名字（或输入 'none' 跳过）: ")
-                    if save == 'none':
-                        save = None
-                    elif save not in message["dead_players"]:
-                        print("无效的选择，请重新输入")
-
-                if message.get("has_poison"):
-                    print("你可以使用毒药毒杀一名玩家。")
-                    print("存活的玩家:", message["alive_players"])
-                    poison = input("请输入要毒杀的玩家名字（或输入 'none' 跳过）: ")
-                    if poison == 'none':
-                        poison = None
-                    elif poison not in message["alive_players"]:
-                        print("无效的选择，请重新输入")
-
-                self.send_message({"save": save, "poison": poison})
+                self.log("\n=== 女巫行动 ===")
+                self.begin_prompt(message, self.witch_prompt(message))
 
             elif action == "seer":
-                print("\n=== 预言家行动 ===")
-                print("可选择查验的玩家:", message["candidates"])
-                while True:
-                    target = input("请选择要查验的玩家: ")
-                    if target in message["candidates"]:
-                        self.send_message({"target": target})
-                        break
-                    print("无效的选择，请重新输入")
+                self.log("\n=== 预言家行动 ===")
+                self.log("可选择查验的玩家:", message["candidates"])
+                self.begin_prompt(message, self.target_prompt(message, "请选择要查验的玩家: "))
 
             elif action == "hunter":
-                print("\n=== 猎人行动 ===")
-                print("可选择的目标:", message["candidates"])
-                while True:
-                    target = input("请选择要击杀的玩家: ")
-                    if target in message["candidates"]:
-                        self.send_message({"target": target})
-                        break
-                    print("无效的选择，请重新输入")
+                self.log("\n=== 猎人行动 ===")
+                self.log("可选择的目标:", message["candidates"])
+                self.begin_prompt(message, self.target_prompt(message, "请选择要击杀的玩家: "))
 
         elif message_type == "seer_result":
-            print(f"\n=== 预言家查验结果 ===")
-            print(f"玩家 {message['target']} 的身份是: {message['result']}")
+            self.log(f"\n=== 预言家查验结果 ===")
+            self.log(f"玩家 {message['target']} 的身份是: {message['result']}")
         
         return True
 
-    def send_message(self, message):
-        try:
-            self.client.send(json.dumps(message).encode())
-        except:
-            print("发送消息失败")
+    def reply(self, prompt, message):
+        # 回复时带回提示消息中的阶段编号，服务端据此丢弃超时后才到达的回复
+        if "phase" in prompt:
+            message["phase"] = prompt["phase"]
+        self.send_message(message)
 
-    def receive_message(self):
+    def reconnect(self):
+        """
+        连接断开后凭会话令牌重连回原座位，服务端会补发状态快照和尚未回复的提示
+        """
+        if not self.token:
+            return False
+        self.prompt = self.prompt_message = None
+        for attempt in range(RECONNECT_ATTEMPTS):
+            self.log(f"连接断开，正在重连 ({attempt + 1}/{RECONNECT_ATTEMPTS})...")
+            time.sleep(RECONNECT_INTERVAL)
+            try:
+                client = socket.create_connection((self.host, self.port))
+            except OSError:
+                continue
+            old_client, self.client = self.client, client
+            old_client.close()
+            self.decoder = FrameDecoder()
+            self.send_message({"name": self.name, "token": self.token, "codec": self.codec})
+            self.start_receiver()
+            return True
+        return False
+
+    def send_message(self, message):
         try:
-            data = self.client.recv(1024)
-            return json.loads(data)
-        except json.JSONDecodeError:
-            print("接收消息失败: JSON解码错误")
-            return {}
-        except:
-            print("接收消息失败")
-            return None
+            self.client.sendall(encode_message(message, self.decoder.codec))
+        except OSError:
+            self.log("发送消息失败")
 
 if __name__ == "__main__":
     client = GameClient()
-    client.start()
\ No newline at end of file
+    client.start()
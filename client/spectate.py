@@ -0,0 +1,89 @@
+import argparse
+import os
+import socket
+import sys
+
+# 复用服务端的 protocol.py 和 replay.py 中的事件描述，客户端目录与服务端目录并列
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "server"))
+from protocol import encode_message, FrameDecoder
+from replay import describe
+from client import display_game_status, apply_status_delta
+
+
+class Spectator:
+    """
+    观战客户端：连接服务端的观战端口，显示状态快照、状态变化和对局事件。
+    持观战密钥或已出局玩家的会话令牌时可以请求上帝视角，否则只能看公开视角
+    """
+    def __init__(self, host='localhost', port=5001, view="public", codec="binary", key=None, token=None):
+        self.client = socket.create_connection((host, port))
+        self.decoder = FrameDecoder()
+        self.hello = {"type": "spectate", "view": view, "codec": codec}
+        if key:
+            self.hello["key"] = key
+        if token:
+            self.hello["token"] = token
+        self.status = None
+        self.names = []
+        self.log = print
+
+    def start(self):
+        self.client.sendall(encode_message(self.hello))
+        while True:
+            try:
+                data = self.client.recv(4096)
+                messages = self.decoder.feed(data) if data else None
+            except (OSError, ValueError):
+                messages = None
+            if messages is None:
+                self.log("连接断开")
+                return
+            for message in messages:
+                if not self.handle_message(message):
+                    return
+
+    def handle_message(self, message):
+        message_type = message.get("type")
+        if message_type == "welcome":
+            self.log(f"已进入观战（{'上帝' if message.get('view') == 'god' else '公开'}视角）")
+        elif message_type == "roster":
+            self.names = list(message["players"])
+        elif message_type == "game_status":
+            self.status = message
+            display_game_status(message, self.log)
+        elif message_type == "status_delta":
+            # 快照已包含的增量直接忽略；版本不连续（积压被丢弃）时请求完整快照
+            if self.status is not None and message["version"] <= self.status.get("version", -1):
+                pass
+            elif self.status is None or message["base"] != self.status.get("version"):
+                self.status = None
+                self.client.sendall(encode_message({"type": "resync"}, self.decoder.codec))
+            else:
+                apply_status_delta(self.status, message)
+                display_game_status(self.status, self.log)
+        elif message_type == "game_event":
+            event = message["event"]
+            if event[0] == "join":
+                self.names.append(event[1])
+            if event[0] not in ("reset_votes", "sheriff_elect"):
+                self.log(describe(event, self.names))
+        elif message_type in ("game_end", "game_cancelled"):
+            self.log("游戏结束" if message_type == "game_end" else "游戏已取消")
+            return False
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="狼人杀观战客户端")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5001, help="服务端的观战端口")
+    parser.add_argument("--view", choices=["public", "god"], default="public")
+    parser.add_argument("--codec", choices=["json", "binary"], default="binary")
+    parser.add_argument("--key", help="观战密钥（上帝视角）")
+    parser.add_argument("--token", help="已出局玩家的会话令牌（上帝视角）")
+    args = parser.parse_args()
+    Spectator(args.host, args.port, args.view, args.codec, args.key, args.token).start()
+
+
+if __name__ == "__main__":
+    main()
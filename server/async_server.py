@@ -0,0 +1,393 @@
+import asyncio
+import random
+import secrets
+import threading
+import time
+from game import WerewolfGame
+from models import Player
+from events import DayEvent, NightEvent
+from protocol import encode_message, decode_message, make_codec, read_frame, read_message, HEADER
+from lobby import Lobby, TABLE_SIZE
+from scheduler import PhaseScheduler, RECONNECT_GRACE
+from status import StatusTracker
+from eventlog import open_journal
+from search_ai import SearchAI
+import phases
+import metrics
+
+
+class AsyncGameSession:
+    """
+    一桌游戏：所有真人玩家的提示与回复都作为协程在同一个事件循环中并发处理
+    """
+    def __init__(self, connections, names, codecs, num_ai_players=0, deadlines=None, log_dir=None,
+                 reconnect_grace=RECONNECT_GRACE, ai_budget=None, seed=None):
+        self.connections = connections
+        self.codecs = codecs
+        self.num_ai_players = num_ai_players
+        self.game = WerewolfGame(seed)
+        self.players = [Player(name) for name in names]
+        self.scheduler = PhaseScheduler(deadlines)
+        self.status = None
+        self.log_dir = log_dir
+        # AI 座位每次决策的搜索时间预算（毫秒），为 None 时使用随机 AI
+        self.ai_budget = ai_budget
+        # 每个连接一个读取任务，把收到的消息放入队列；阶段等待只在队列上超时，不会打断半帧读取
+        self.inboxes = [asyncio.Queue() for _ in connections]
+        self.disconnected = [False] * len(connections)
+        self.readers = []
+        # 断线时间与未回复的提示，用于宽限期内重连后恢复
+        self.reconnect_grace = reconnect_grace
+        self.disconnected_at = [None] * len(connections)
+        self.pending_prompts = [None] * len(connections)
+
+    async def start(self):
+        self.readers = [asyncio.create_task(self.read_loop(i)) for i in range(len(self.connections))]
+        await self.broadcast_message({"type": "wait_confirm", "players": [player.name for player in self.players]})
+
+        confirmations = await asyncio.gather(*(self.receive_message(i) for i in range(len(self.connections))))
+
+        if all(c.get("confirm") for c in confirmations):
+            if self.log_dir:
+                self.game.journal = open_journal(self.log_dir, self.game.seed)
+            for player in self.players:
+                self.game.add_player(player)
+
+            names = ['Stephanie', 'Wendy', 'Elmy', 'Sham', 'Jeffry', 'Kelly']
+            for i in range(min(self.num_ai_players, len(names))):
+                self.game.add_player(Player(names[i], is_ai=True))
+
+            self.game.random_allocate()
+            if self.ai_budget:
+                self.game.ai = SearchAI(self.game, self.ai_budget)
+            await self.send_roster()
+            self.status = StatusTracker(self.game)
+            await self.send_game_status()
+
+            self.game.events = [
+                NightEvent("黑夜", "狼人行动"),
+                DayEvent("白天", "讨论和投票"),
+            ]
+
+            await self.run_game()
+        else:
+            await self.broadcast_message({"type": "game_cancelled"})
+
+    async def run_game(self):
+        print("=== 狼人杀游戏开始 ===")
+
+        while True:
+            for event in self.game.events:
+                if isinstance(event, NightEvent):
+                    await self.handle_night_phase(event)
+                if not self.game.sheriff and not self.game.sheriff_elect:
+                    await self.handle_sheriff_election()
+                    self.game.sheriff_elect = True
+                if not self.game.sheriff and self.game.sheriff_elect:
+                    self.game.transfer_sheriff()
+                elif isinstance(event, DayEvent):
+                    await self.handle_day_phase()
+
+                await self.send_status_update()
+
+                if self.game.check_game_end():
+                    if self.game.journal:
+                        self.game.journal.close()
+                    await self.broadcast_message({"type": "game_end"})
+                    return
+                if self.game.journal:
+                    # 每个阶段结束时日志落盘，必要时写快照
+                    self.game.journal.checkpoint(self.game)
+
+    async def handle_sheriff_election(self):
+        phase = self.scheduler.begin("sheriff_election")
+        votes = [self.player_sheriff_vote(i, player, phase) for i, player in enumerate(self.players) if player.alive]
+        self.game.ai_sheriff_votes(self.players)
+        await asyncio.gather(*votes)
+        phase.finish()
+        self.game.elect_sheriff()
+
+    async def player_sheriff_vote(self, player_index, player, phase):
+        await self.send_prompt(phases.sheriff_prompt(self.game), player_index, phase)
+        response = await self.receive_response(player_index, player, phase)
+        phases.apply_sheriff_vote(self.game, player, response)
+
+    async def handle_day_phase(self):
+        self.game.day_actions()
+        phase = self.scheduler.begin("day_vote")
+        votes = [self.player_day_vote(i, player, phase) for i, player in enumerate(self.players) if player.alive]
+        self.game.ai_day_votes()
+        await asyncio.gather(*votes)
+        phase.finish()
+        self.game.vote()
+
+    async def player_day_vote(self, player_index, player, phase):
+        await self.send_prompt(phases.day_vote_prompt(self.game, player), player_index, phase)
+        response = await self.receive_response(player_index, player, phase)
+        phases.apply_day_vote(self.game, player, response)
+
+    async def handle_night_phase(self, event):
+        """
+        按 NightEvent 声明的依赖推进夜间子阶段：每个子阶段在它依赖的子阶段完成后立即开始，
+        互不依赖的子阶段（狼人与预言家）同时提示
+        """
+        self.game.begin_night()
+        await self.run_stages(event.stages)
+        event.settle(self.game)
+        await self.run_stages(event.after)
+
+    async def run_stages(self, stages):
+        tasks = {}
+        for stage in stages:
+            tasks[stage.name] = asyncio.ensure_future(
+                self.run_stage(stage, [tasks[name] for name in stage.requires]))
+        await asyncio.gather(*tasks.values())
+
+    async def run_stage(self, stage, requires):
+        await asyncio.gather(*requires)
+        stage.begin(self.game)
+        await self.process_role(lambda player: stage.selects(self.game, player), stage.name)
+        stage.end(self.game)
+
+    async def process_role(self, selects, role_type):
+        phase = self.scheduler.begin(role_type)
+        await asyncio.gather(*(
+            self.player_night_action(i, player, role_type, phase)
+            for i, player in enumerate(self.players)
+            if selects(player)
+        ))
+        phase.finish()
+
+    async def player_night_action(self, player_index, player, role_type, phase):
+        try:
+            await self.send_prompt(phases.night_prompt(self.game, player, role_type), player_index, phase)
+            response = await self.receive_response(player_index, player, phase)
+            reply = phases.apply_night_response(self.game, player, role_type, response)
+            if reply:
+                await self.send_message(reply, player_index)
+        except Exception as e:
+            print(f"处理玩家 {player.name} 夜间行动时发生错误: {str(e)}")
+
+    async def send_game_status(self):
+        await asyncio.gather(*(
+            self.send_data(self.status.snapshot(player, self.codecs[i]), i)
+            for i, player in enumerate(self.players)
+        ))
+
+    async def send_status_update(self):
+        delta = self.status.delta()
+        if delta:
+            await self.broadcast_message(delta)
+
+    async def send_roster(self):
+        # 座位表下发后，二进制编码中的玩家名改用座位号表示
+        names = [p.name for p in self.game.players]
+        await self.broadcast_message({"type": "roster", "players": names})
+        for codec in self.codecs:
+            codec.set_roster(names)
+
+    async def broadcast_message(self, message):
+        # 每种编码只序列化一次，同一编码的连接发送相同的字节
+        encoded = {}
+        for (_, writer), codec in zip(self.connections, self.codecs):
+            if codec.name not in encoded:
+                with metrics.registry.time("werewolf_encode_seconds", codec=codec.name):
+                    encoded[codec.name] = encode_message(message, codec)
+            writer.write(encoded[codec.name])
+            metrics.registry.inc("werewolf_sent_bytes_total", len(encoded[codec.name]))
+        await asyncio.gather(*(writer.drain() for _, writer in self.connections), return_exceptions=True)
+
+    async def send_message(self, message, player_index):
+        codec = self.codecs[player_index]
+        with metrics.registry.time("werewolf_encode_seconds", codec=codec.name):
+            data = encode_message(message, codec)
+        await self.send_data(data, player_index)
+
+    async def send_data(self, data, player_index):
+        _, writer = self.connections[player_index]
+        try:
+            writer.write(data)
+            metrics.registry.inc("werewolf_sent_bytes_total", len(data))
+            await writer.drain()
+        except Exception:
+            print("发送消息失败")
+
+    async def read_loop(self, player_index):
+        reader, _ = self.connections[player_index]
+        inbox = self.inboxes[player_index]
+        codec = self.codecs[player_index]
+        while True:
+            try:
+                body = await read_frame(reader)
+                metrics.registry.inc("werewolf_received_bytes_total", HEADER.size + len(body))
+                with metrics.registry.time("werewolf_decode_seconds", codec=codec.name):
+                    message = decode_message(body, codec)
+            except ValueError:
+                print("接收消息失败: 消息解码错误")
+                continue
+            except (asyncio.IncompleteReadError, ConnectionError):
+                print(f"玩家{player_index + 1}连接断开")
+                break
+            except Exception as e:
+                print(f"接收消息失败: {e}")
+                break
+            if message.get("type") == "resync":
+                if self.status:
+                    await self.send_data(self.status.snapshot(self.players[player_index], self.codecs[player_index]), player_index)
+                continue
+            inbox.put_nowait(message)
+        self.disconnected[player_index] = True
+        self.disconnected_at[player_index] = time.monotonic()
+        inbox.put_nowait({})
+
+    def can_resume(self, player_index):
+        disconnected_at = self.disconnected_at[player_index]
+        return disconnected_at is None or time.monotonic() - disconnected_at <= self.reconnect_grace
+
+    async def resume(self, player_index, reader, writer, codec, token):
+        """
+        断线玩家重连：换上新连接和读取任务，补发座位表、状态快照以及尚未回复的提示
+        """
+        self.readers[player_index].cancel()
+        self.connections[player_index][1].close()
+        self.connections[player_index] = (reader, writer)
+        self.codecs[player_index] = codec
+        self.disconnected[player_index] = False
+        self.disconnected_at[player_index] = None
+        self.readers[player_index] = asyncio.create_task(self.read_loop(player_index))
+        print(f"玩家{player_index + 1}已重连")
+
+        writer.write(encode_message({"type": "welcome", "codec": codec.name, "token": token, "resumed": True}))
+        if self.status:
+            names = [p.name for p in self.game.players]
+            await self.send_message({"type": "roster", "players": names}, player_index)
+            codec.set_roster(names)
+            await self.send_data(self.status.snapshot(self.players[player_index], codec), player_index)
+        pending = self.pending_prompts[player_index]
+        if pending and not pending[0].expired():
+            await self.send_message(pending[1], player_index)
+
+    async def send_prompt(self, message, player_index, phase):
+        # 记录未回复的提示，玩家重连后补发
+        self.pending_prompts[player_index] = (phase, phase.tag(message))
+        await self.send_message(message, player_index)
+
+    async def receive_response(self, player_index, player, phase):
+        # 在提示发出后立即调用，等待时间即玩家的响应延迟
+        started = time.monotonic()
+        response = await self.receive_message(player_index, phase)
+        self.pending_prompts[player_index] = None
+        if response:
+            metrics.registry.observe("werewolf_response_seconds", time.monotonic() - started, phase=phase.name)
+        else:
+            metrics.registry.inc("werewolf_response_timeouts_total", phase=phase.name)
+            print(f"玩家 {player.name} 未在时限内行动，按默认行动处理")
+            response = phases.default_response(self.game, player, phase.name)
+        return response
+
+    async def receive_message(self, player_index, phase=None):
+        """
+        读取下一条消息；传入 phase 时最多等到该阶段截止，超时返回 None，
+        并丢弃属于之前阶段的迟到回复
+        """
+        inbox = self.inboxes[player_index]
+        while True:
+            # 断线超过宽限期后不再等待；宽限期内一直等到阶段截止，期间重连的回复照常接收
+            if self.disconnected[player_index] and inbox.empty() and (phase is None or not self.can_resume(player_index)):
+                return {}
+            try:
+                if phase:
+                    message = await asyncio.wait_for(inbox.get(), phase.remaining())
+                else:
+                    message = await inbox.get()
+            except asyncio.TimeoutError:
+                return None
+            if not message and phase and self.can_resume(player_index):
+                continue
+            if phase is None or not message or phase.accepts(message):
+                return message
+            print(f"丢弃玩家{player_index + 1}的过期回复: {message}")
+
+    def close(self):
+        if self.game.journal:
+            self.game.journal.close()
+        for task in self.readers:
+            task.cancel()
+        for _, writer in self.connections:
+            writer.close()
+
+
+class AsyncGameServer:
+    """
+    基于 asyncio 的服务端：持续接受连接，由大厅把玩家分进房间，多个房间在同一事件循环中并行对局
+    """
+    def __init__(self, host='localhost', port=5000, room_size=TABLE_SIZE, deadlines=None, log_dir=None,
+                 metrics_port=None, ai_budget=None, seed=None):
+        self.host = host
+        self.port = port
+        self.deadlines = deadlines
+        self.log_dir = log_dir
+        self.ai_budget = ai_budget
+        # 指定种子时各房间的对局种子按开局顺序从它派生，整个进程的对局可复现
+        self.seeds = random.Random(seed) if seed is not None else None
+        self.lobby = Lobby(self.create_session, room_size)
+        # 指定端口时开启指标埋点，并在本地 HTTP 端口提供 Prometheus 格式输出
+        if metrics_port:
+            metrics.serve(metrics_port)
+            metrics.registry.gauge("werewolf_active_rooms", lambda: len(self.lobby.rooms))
+            metrics.registry.gauge("werewolf_threads", threading.active_count)
+
+    def create_session(self, connections, names, codecs, num_ai_players):
+        seed = self.seeds.getrandbits(64) if self.seeds else None
+        return AsyncGameSession(connections, names, codecs, num_ai_players, self.deadlines, self.log_dir,
+                                ai_budget=self.ai_budget, seed=seed)
+
+    async def handle_connection(self, reader, writer):
+        print(f"玩家已连接: {writer.get_extra_info('peername')}")
+        try:
+            hello = await read_message(reader)
+        except Exception as e:
+            print(f"接收玩家信息失败: {e}")
+            writer.close()
+            return
+        # 握手回复固定用 JSON 发送，之后的消息改用协商出的编码
+        codec = make_codec(hello.get("codec"))
+        if hello.get("token"):
+            await self.resume_session(hello["token"], reader, writer, codec)
+            return
+        token = secrets.token_urlsafe(16)
+        writer.write(encode_message({"type": "welcome", "codec": codec.name, "token": token}))
+        room = self.lobby.join(hello.get("name"), reader, writer, codec, token, hello.get("room_size"))
+        writer.write(encode_message({
+            "type": "room_joined",
+            "room": room.room_id,
+            "size": room.size,
+            "players": room.names,
+        }, codec))
+        await writer.drain()
+
+    async def resume_session(self, token, reader, writer, codec):
+        # 只有已开局且仍在宽限期内的座位可以重连
+        entry = self.lobby.resume(token)
+        if entry:
+            room, player_index = entry
+            if room.session and room.session.readers and room.session.can_resume(player_index):
+                await room.session.resume(player_index, reader, writer, codec, token)
+                return
+        writer.write(encode_message({"type": "reconnect_rejected"}))
+        await writer.drain()
+        writer.close()
+
+    async def serve(self):
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        print("等待玩家连接...")
+        async with server:
+            await server.serve_forever()
+
+    def start(self):
+        asyncio.run(self.serve())
+
+
+if __name__ == "__main__":
+    server = AsyncGameServer()
+    server.start()
@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from protocol import encode_message, make_codec, read_message, JSON
+from scheduler import PHASE_DEADLINES
+
+
+class LoadStats:
+    def __init__(self):
+        # 阶段延迟：客户端发出回复到收到服务端下一条消息的时间（秒），按提示类型分组
+        self.latency = defaultdict(list)
+        self.rooms = set()
+        self.finished = 0
+        self.cancelled = 0
+        self.errors = 0
+        # 服务端进程与其空闲时的常驻内存（KB）：asyncio 版在开始监听后读取，线程版在第一位玩家收到 welcome 时读取
+        self.server = None
+        self.baseline_rss = None
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def scripted_answer(message):
+    """
+    与 client/client.py 相同的提示，按固定脚本立即作答
+    """
+    message_type = message.get("type")
+    if message_type == "wait_confirm":
+        return {"confirm": True}
+    if message_type in ("sheriff_election", "day_vote"):
+        return {"vote": message["candidates"][0]} if message["candidates"] else {}
+    if message_type == "night_action":
+        if message["action"] == "witch":
+            return {"save": None, "poison": None}
+        return {"target": message["candidates"][0]} if message["candidates"] else {}
+    return None
+
+
+def prompt_label(message):
+    if message.get("type") == "night_action":
+        return message["action"]
+    return message.get("type")
+
+
+async def connect(host, port, process=None, timeout=10.0):
+    # 服务端子进程可能还没开始监听，连接被拒绝时稍后重试；子进程已经退出（如端口被占用）时立即报错
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return await asyncio.open_connection(host, port)
+        except ConnectionRefusedError:
+            if process is not None:
+                check_server(process)
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.02)
+
+
+async def synthetic_client(host, port, name, codec_name, room_size, stats):
+    reader, writer = await connect(host, port, stats.server)
+    codec = JSON
+    hello = {"name": name, "codec": codec_name}
+    if room_size:
+        hello["room_size"] = room_size
+    writer.write(encode_message(hello))
+    pending = None
+    try:
+        while True:
+            message = await read_message(reader, codec)
+            now = time.perf_counter()
+            if pending:
+                stats.latency[pending[0]].append(now - pending[1])
+                pending = None
+            message_type = message.get("type")
+            if message_type == "welcome":
+                codec = make_codec(message.get("codec"))
+                if stats.baseline_rss is None:
+                    stats.baseline_rss = read_proc_kb(stats.server.pid, "VmRSS")
+            elif message_type == "room_joined":
+                stats.rooms.add(message["room"])
+            elif message_type == "game_end":
+                stats.finished += 1
+                return
+            elif message_type == "game_cancelled":
+                stats.cancelled += 1
+                return
+            answer = scripted_answer(message)
+            if answer is not None:
+                if "phase" in message:
+                    answer["phase"] = message["phase"]
+                writer.write(encode_message(answer, codec))
+                pending = (prompt_label(message), time.perf_counter())
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        stats.errors += 1
+    finally:
+        writer.close()
+
+
+def read_proc_kb(pid, field):
+    # 仅 Linux 可从 /proc 读到进程内存（VmRSS 为当前常驻内存，VmHWM 为其峰值），其他平台或进程已退出时返回 None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+async def sample_peak_rss(pid, samples):
+    # 对局进行期间定时读取 VmHWM；线程版服务端跑完一局会自行退出，退出后就读不到了
+    while True:
+        peak = read_proc_kb(pid, "VmHWM")
+        if peak is not None:
+            samples.append(peak)
+        await asyncio.sleep(0.05)
+
+
+def spawn_server(kind, port, room_size, deadline):
+    command = [sys.executable, __file__, "--serve", kind, "--port", str(port),
+               "--room-size", str(room_size), "--deadline", str(deadline)]
+    # 标准错误写入临时文件，服务端启动失败时用于报错
+    errors = tempfile.TemporaryFile()
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=errors)
+    process.errors = errors
+    return process
+
+
+def check_server(process):
+    if process.poll() is not None:
+        process.errors.seek(0)
+        output = process.errors.read().decode(errors="replace").strip().splitlines()
+        raise RuntimeError(f"服务端子进程已退出（退出码 {process.returncode}），未能开始监听: "
+                           + (output[-1] if output else "无错误输出"))
+
+
+def stop_server(process):
+    """
+    结束服务端子进程并返回其 CPU 时间（秒）。
+    线程版服务端跑完一局会自行退出，所以只在仍在运行时终止；CPU 时间取回收前后子进程累计值之差
+    """
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    if process.poll() is None:
+        process.terminate()
+    process.wait()
+    process.errors.close()
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime
+
+
+async def wait_listening(host, port, process):
+    # 仅用于 asyncio 服务端：空连接会被当作握手失败直接关闭，不占用房间
+    _, writer = await connect(host, port, process)
+    writer.close()
+
+
+async def run_measured(host, port, count, room_size, codec_name, concurrency, stats):
+    """
+    跑完所有客户端，返回期间服务端的峰值常驻内存（VmHWM，KB）
+    """
+    samples = []
+    sampler = asyncio.create_task(sample_peak_rss(stats.server.pid, samples))
+    try:
+        await run_clients(host, port, count, room_size, codec_name, concurrency, stats)
+    finally:
+        sampler.cancel()
+    # asyncio 版服务端此时仍在运行，再读一次
+    peak = read_proc_kb(stats.server.pid, "VmHWM")
+    if peak is not None:
+        samples.append(peak)
+    return max(samples) if samples else None
+
+
+async def run_clients(host, port, count, room_size, codec_name, concurrency, stats):
+    # 同时在线的客户端数不超过 concurrency 个房间，房间按连接到达顺序凑满
+    slots = asyncio.Semaphore(concurrency * room_size)
+
+    async def one(i):
+        async with slots:
+            try:
+                await synthetic_client(host, port, f"bot{i}", codec_name, room_size, stats)
+            except OSError:
+                stats.errors += 1
+
+    await asyncio.gather(*(one(i) for i in range(count)))
+
+
+def bench_async(args, stats):
+    # 内存按同一来源（/proc）计：开始监听后的空闲 VmRSS 为基线，对局期间的 VmHWM 为峰值
+    process = stats.server = spawn_server("async", args.port, args.room_size, args.deadline)
+    try:
+        asyncio.run(wait_listening(args.host, args.port, process))
+        stats.baseline_rss = read_proc_kb(process.pid, "VmRSS")
+        peak_rss = asyncio.run(run_measured(args.host, args.port, args.matches * args.room_size,
+                                            args.room_size, args.codec, args.concurrency, stats))
+    finally:
+        cpu = stop_server(process)
+    return cpu, peak_rss, stats.baseline_rss, args.concurrency
+
+
+def bench_threaded(args, stats):
+    # 线程版服务端一个进程只跑一局 8 名真人的对局，逐局启动新进程；
+    # 内存基线为第一位玩家收到 welcome 时的 VmRSS，取各局中（峰值 - 基线）最大的一局
+    cpu_total = 0
+    peak_rss = baseline_rss = None
+    for i in range(args.matches):
+        port = args.port + i
+        process = stats.server = spawn_server("threaded", port, 8, args.deadline)
+        stats.baseline_rss = None
+        try:
+            peak = asyncio.run(run_measured(args.host, port, 8, 8, args.codec, 1, stats))
+        finally:
+            cpu_total += stop_server(process)
+        stats.rooms.add(i)
+        if peak is not None and stats.baseline_rss is not None:
+            if peak_rss is None or peak - stats.baseline_rss > peak_rss - baseline_rss:
+                peak_rss, baseline_rss = peak, stats.baseline_rss
+    return cpu_total, peak_rss, baseline_rss, 1
+
+
+def run(args):
+    stats = LoadStats()
+    started = time.perf_counter()
+    if args.server == "async":
+        cpu, peak_rss, baseline_rss, concurrent_rooms = bench_async(args, stats)
+    else:
+        cpu, peak_rss, baseline_rss, concurrent_rooms = bench_threaded(args, stats)
+    elapsed = time.perf_counter() - started
+
+    room_size = args.room_size if args.server == "async" else 8
+    matches = stats.finished // room_size
+    latency = {}
+    for label, samples in sorted(stats.latency.items()):
+        latency[label] = {
+            "count": len(samples),
+            "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        }
+    rss_per_room = None
+    if peak_rss is not None and baseline_rss is not None:
+        rss_per_room = round((peak_rss - baseline_rss) / concurrent_rooms, 1)
+    return {
+        "server": args.server,
+        "codec": args.codec,
+        "room_size": room_size,
+        "concurrency": concurrent_rooms,
+        "rooms": len(stats.rooms),
+        "matches": matches,
+        "cancelled": stats.cancelled // room_size,
+        "client_errors": stats.errors,
+        "elapsed_s": round(elapsed, 3),
+        "matches_per_s": round(matches / elapsed, 2) if elapsed else None,
+        "phase_latency": latency,
+        "cpu_s_per_room": round(cpu / matches, 4) if matches else None,
+        "peak_rss_kb": peak_rss,
+        "rss_kb_per_room": rss_per_room,
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def serve(args):
+    deadlines = {name: args.deadline for name in PHASE_DEADLINES}
+    if args.serve == "async":
+        from async_server import AsyncGameServer
+        AsyncGameServer(args.host, args.port, args.room_size, deadlines).start()
+    else:
+        from server import GameServer
+        GameServer(args.host, args.port, deadlines).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="协议级压力测试：合成客户端对服务端发起完整对局")
+    parser.add_argument("--server", choices=["async", "threaded"], default="async")
+    parser.add_argument("--matches", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10, help="同时进行的房间数（仅 asyncio 服务端）")
+    parser.add_argument("--room-size", type=int, default=8, help="每房间真人（合成客户端）数")
+    parser.add_argument("--codec", choices=["json", "binary"], default="json")
+    parser.add_argument("--deadline", type=float, default=5.0, help="各阶段截止时间（秒）")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5100)
+    parser.add_argument("--output", help="结果 JSON 文件路径，便于不同版本间对比")
+    parser.add_argument("--serve", choices=["async", "threaded"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    result = run(args)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
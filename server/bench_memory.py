@@ -0,0 +1,43 @@
+import argparse
+import gc
+import tracemalloc
+from game import WerewolfGame
+from models import Player
+
+
+def build_room(num_players):
+    game = WerewolfGame()
+    for i in range(num_players):
+        game.add_player(Player(f"玩家{i + 1}", is_ai=True))
+    game.random_allocate()
+    return game
+
+
+def measure(num_rooms, num_players):
+    """
+    返回每个房间（一局 WerewolfGame 及其玩家、角色）占用的平均字节数
+    """
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    rooms = [build_room(num_players) for _ in range(num_rooms)]
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rooms
+    return (after - before) / num_rooms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="房间内存占用基准")
+    parser.add_argument("--rooms", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=8)
+    args = parser.parse_args()
+
+    per_room = measure(args.rooms, args.players)
+    print(f"{args.rooms} 个房间，每房间 {args.players} 名玩家")
+    print(f"每房间 {per_room:.0f} 字节，每名玩家 {per_room / args.players:.0f} 字节")
+
+
+if __name__ == "__main__":
+    main()
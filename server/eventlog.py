@@ -0,0 +1,286 @@
+import atexit
+import itertools
+import os
+import queue
+import threading
+import time
+from protocol import BinaryCodec, HEADER, frame
+from game import WerewolfGame
+from models import Player
+from roles import ROLES
+
+# 日志格式版本，记录格式不兼容的修改时递增
+LOG_VERSION = 1
+# 快照格式版本，与当前版本不符的快照直接忽略，改为完整回放
+SNAPSHOT_VERSION = 4
+_journal_ids = itertools.count(1)
+
+
+class DiskWriter:
+    """
+    所有事件日志共用的写盘线程：写文件和 fsync 按提交顺序在这里执行，
+    调用方（游戏线程或事件循环）只负责编码，不会被磁盘同步阻塞。进程退出前等待队列写完
+    """
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, job, *args):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+                atexit.register(self.queue.join)
+        self.queue.put((job, args))
+
+    def run(self):
+        while True:
+            job, args = self.queue.get()
+            try:
+                job(*args)
+            except OSError as e:
+                print(f"事件日志写盘失败: {e}")
+            finally:
+                self.queue.task_done()
+
+
+_writer = DiskWriter()
+
+
+class EventLog:
+    """
+    只追加的对局事件日志：每条事件编码为一帧（长度前缀 + 二进制编码），
+    先写入内存缓冲，攒够一批或超过时间间隔后整批交给写盘线程写入并 fsync。
+    checkpoint 时在旁边的 .snap 文件中写入完整快照及其对应的日志偏移，
+    恢复时只需加载快照并回放之后的少量事件
+    """
+    def __init__(self, path, seed=None, batch_size=64, sync_interval=1.0, snapshot_every=200):
+        self.path = path
+        self.snapshot_path = path + ".snap"
+        self.codec = BinaryCodec()
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.snapshot_every = snapshot_every
+        self.buffer = bytearray()
+        self.pending = 0
+        self.count = 0
+        self.last_snapshot = 0
+        self.last_sync = time.monotonic()
+        self.closed = False
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        # 已交给写盘线程的日志长度，即下一批事件在文件中的偏移
+        self.offset = self.file.tell()
+        if new:
+            self.append(("header", LOG_VERSION, seed))
+        else:
+            self.count = sum(1 for _ in read_events(path))
+
+    def append(self, event):
+        self.buffer += frame(self.codec.encode(event))
+        self.pending += 1
+        self.count += 1
+        if self.pending >= self.batch_size or time.monotonic() - self.last_sync >= self.sync_interval:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            data = bytes(self.buffer)
+            self.offset += len(data)
+            _writer.submit(self.write, data)
+            self.buffer.clear()
+            self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def write(self, data):
+        # 在写盘线程中执行
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def checkpoint(self, game):
+        """
+        在阶段边界调用：把缓冲交给写盘线程，距上次快照的事件数足够多时再写一份新快照。
+        快照在调用方编码（读取对局状态），写盘同样交给写盘线程，排在这批日志之后
+        """
+        self.flush()
+        if self.count - self.last_snapshot < self.snapshot_every:
+            return
+        state = snapshot_game(game)
+        state["offset"] = self.offset
+        state["events"] = self.count
+        _writer.submit(self.write_snapshot, self.codec.encode(state))
+        self.last_snapshot = self.count
+
+    def write_snapshot(self, data):
+        # 先写临时文件再原子替换，崩溃时旧快照仍然完整可用
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.flush()
+            _writer.submit(self.file.close)
+
+
+def open_journal(log_dir, seed=None):
+    """
+    在 log_dir 下为新对局创建一份事件日志
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    name = f"game-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_journal_ids)}.log"
+    return EventLog(os.path.join(log_dir, name), seed)
+
+
+def read_events(path, offset=0):
+    """
+    依次读出日志中的事件；末尾写了一半的帧（写盘时崩溃）直接忽略
+    """
+    codec = BinaryCodec()
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    pos = 0
+    while pos + HEADER.size <= len(data):
+        (length,) = HEADER.unpack_from(data, pos)
+        end = pos + HEADER.size + length
+        if end > len(data):
+            break
+        yield codec.decode(data[pos + HEADER.size:end])
+        pos = end
+
+
+def snapshot_game(game):
+    """
+    存活、警长标记、AI 座位和查验记录都是按座位的位集，快照里只是几个整数
+    """
+    states = []
+    for p in game.players:
+        state = None
+        if p.state is not None:
+            state = {slot: getattr(p.state, slot) for slot in p.state.__slots__}
+        states.append(state)
+    return {
+        "version": SNAPSHOT_VERSION,
+        "names": [p.name for p in game.players],
+        "roles": [p.role.name if p.role else None for p in game.players],
+        "ai": sum(1 << p.seat for p in game.players if p.is_ai),
+        "alive": game.alive_mask,
+        "night": [game.night.kill, game.night.save, game.night.poison, game.night.shots],
+        "sheriff_flags": game.sheriff_mask,
+        "checked": list(game.checked),
+        "votes": [p.votes for p in game.players],
+        "states": states,
+        "day_count": game.day_count,
+        "sheriff": game.sheriff.seat if game.sheriff else None,
+        "sheriff_elect": game.sheriff_elect,
+        "wolf_kill_target": game.wolf_kill_target,
+        "human_wolf_votes": dict(game.human_wolf_votes),
+        "winner": game.winner,
+    }
+
+
+def restore_game(state):
+    game = WerewolfGame()
+    game.log = lambda *args, **kwargs: None
+    for seat, name in enumerate(state["names"]):
+        game.add_player(Player(name, is_ai=bool(state["ai"] >> seat & 1)))
+    if all(state["roles"]):
+        game.assign_roles([ROLES[name] for name in state["roles"]])
+        game.checked = list(state["checked"])
+    # 警长死后警徽标记不清除，当前警长以 sheriff 座位为准
+    game.sheriff_mask = state["sheriff_flags"]
+    for player, votes, role_state in zip(game.players, state["votes"], state["states"]):
+        if not state["alive"] >> player.seat & 1:
+            game.kill(player)
+        player.sheriff = bool(game.sheriff_mask >> player.seat & 1)
+        player.votes = votes
+        for slot, value in (role_state or {}).items():
+            setattr(player.state, slot, value)
+    if state["sheriff"] is not None:
+        game.sheriff = game.player_at(state["sheriff"])
+    kill, save, poison, shots = state["night"]
+    game.night.kill = kill
+    game.night.save = tuple(save) if save else None
+    game.night.poison = tuple(poison) if poison else None
+    game.night.shots = [tuple(shot) for shot in shots]
+    game.day_count = state["day_count"]
+    game.sheriff_elect = state["sheriff_elect"]
+    game.wolf_kill_target = state["wolf_kill_target"]
+    game.human_wolf_votes.update(state["human_wolf_votes"])
+    game.winner = state["winner"]
+    return game
+
+
+def apply_event(game, event):
+    """
+    把一条日志事件重新作用到对局上；事件记录的是结果而不是决策，回放不需要随机数
+    """
+    kind = event[0]
+    if kind == "join":
+        game.add_player(Player(event[1], is_ai=event[2]))
+    elif kind == "allocate":
+        game.assign_roles([ROLES[name] for name in event[1]])
+    elif kind == "alive":
+        game._set_alive(game.player_at(event[1]), event[2])
+    elif kind == "vote":
+        game.cast_vote(game.player_at(event[1]), game.player_at(event[2]), event[3])
+    elif kind == "reset_votes":
+        game._reset_votes()
+    elif kind == "sheriff":
+        game.set_sheriff(game.player_at(event[1]))
+    elif kind == "sheriff_elect":
+        game.sheriff_elect = True
+    elif kind == "potion":
+        game.use_potion(game.player_at(event[1]), event[2])
+    elif kind == "wolf_vote":
+        game.human_wolf_votes[event[2]] += 1
+    elif kind == "check":
+        game.check(game.player_at(event[1]), game.player_at(event[2]))
+    elif kind == "wolf_kill":
+        game.set_wolf_kill(game.player_at(event[1]) if event[1] is not None else None)
+        game.human_wolf_votes.clear()
+    elif kind == "intent":
+        # 意图在记录时已经校验过，回放直接写入当晚的意图
+        target = (event[2], event[3])
+        if event[1] == "shoot":
+            game.night.shots.append(target)
+        else:
+            setattr(game.night, event[1], target)
+    elif kind == "night":
+        game.begin_night()
+    elif kind == "day":
+        game.day_count = event[1]
+    elif kind == "winner":
+        game.winner = event[1]
+    # header 等事件只用于审计，不改变对局状态
+
+
+def replay(path, offset=0, game=None):
+    game = game or WerewolfGame()
+    game.log = lambda *args, **kwargs: None
+    for event in read_events(path, offset):
+        apply_event(game, event)
+    return game
+
+
+def recover(path):
+    """
+    从快照加日志尾部恢复对局；快照缺失或损坏时从头回放整份日志
+    """
+    snapshot_path = path + ".snap"
+    if os.path.exists(snapshot_path):
+        try:
+            with open(snapshot_path, "rb") as f:
+                state = BinaryCodec().decode(f.read())
+        except ValueError:
+            state = None
+        if state and state.get("version") == SNAPSHOT_VERSION and state["offset"] <= os.path.getsize(path):
+            return replay(path, state["offset"], restore_game(state))
+    return replay(path)
@@ -5,7 +5,7 @@ class GameEvent(ABC):
     def __init__(self, name, description):
         self.name = name
         self.description = description
-    
+
     @abstractmethod
     def execute(self, game):
         pass
@@ -15,16 +15,82 @@ class DayEvent(GameEvent):
         super().__init__(name, description)
     def execute(self, game):
         if not game.sheriff:
-            print("警长选举", "玩家投票选举警长")
+            game.log("警长选举", "玩家投票选举警长")
+            game.ai_sheriff_votes()
             game.elect_sheriff()
-        print(f"\n=== {self.name} ===")
+        game.log(f"\n=== {self.name} ===")
         game.day_actions()
+        game.ai_day_votes()
         game.vote()
 
+class NightStage:
+    """
+    夜间的一个角色子阶段。requires 是必须先完成的子阶段（数据依赖），互不依赖的子阶段可以同时进行；
+    子阶段开始时 act 执行 AI 角色的行动，selects 选出需要提示的真人，
+    真人回复应用之后 resolve 结算本子阶段（如统计狼人票）
+    """
+    def __init__(self, name, selects, requires=(), act=None, resolve=None):
+        self.name = name
+        self.selects = selects
+        self.requires = requires
+        self.act = act
+        self.resolve = resolve
+
+    def begin(self, game):
+        if self.act:
+            self.act(game)
+
+    def end(self, game):
+        if self.resolve:
+            self.resolve(game)
+
+# 夜间结算这一步在 NightEvent.execute 的 done 中使用的名字
+SETTLE = "settle"
+
+# 按依赖关系声明的夜间流程，被依赖的子阶段写在前面：
+# 女巫需要知道狼人的击杀目标，预言家不依赖任何子阶段。这些子阶段只写入当晚的意图（game.night）
+NIGHT_STAGES = (
+    NightStage("werewolf", lambda game, p: p.alive and p.is_wolf(),
+               resolve=lambda game: game.night_actions()),
+    NightStage("seer", lambda game, p: p.alive and p.is_seer(),
+               act=lambda game: game.ai_night_actions(lambda p: p.is_seer(), "预言家")),
+    NightStage("witch", lambda game, p: p.alive and p.is_witch(), requires=("werewolf",),
+               act=lambda game: game.ai_night_actions(lambda p: p.is_witch(), "女巫")),
+)
+
+# 结算之后的子阶段：被狼人击杀触发的猎人开枪
+DAWN_STAGES = (
+    NightStage("hunter", lambda game, p: game.hunter_triggered(p),
+               act=lambda game: game.ai_hunter_actions(),
+               resolve=lambda game: game.resolve_shots()),
+)
+
 class NightEvent(GameEvent):
-    def __init__(self, name, description):
+    """
+    一晚分三步：stages 中的子阶段按依赖写入意图，settle 一次结算生死，再进行 after 中的子阶段
+    """
+    def __init__(self, name, description, stages=NIGHT_STAGES, after=DAWN_STAGES):
         super().__init__(name, description)
-        
-    def execute(self, game):
-        print(f"\n=== {self.name} ===")
-        game.night_actions()
\ No newline at end of file
+        self.stages = stages
+        self.after = after
+
+    def settle(self, game):
+        game.resolve_night()
+
+    def execute(self, game, done=()):
+        """
+        无真人时按声明顺序依次执行各子阶段；done 中的子阶段（以及 SETTLE）视为已经完成（推演从夜间中途开始时使用）
+        """
+        game.log(f"\n=== {self.name} ===")
+        if not done:
+            game.begin_night()
+        for stage in self.stages:
+            if stage.name not in done:
+                stage.begin(game)
+                stage.end(game)
+        if SETTLE not in done:
+            self.settle(game)
+        for stage in self.after:
+            if stage.name not in done:
+                stage.begin(game)
+                stage.end(game)
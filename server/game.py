@@ -1,9 +1,61 @@
 from collections import defaultdict
 import random
-from roles import Wolf, Seer, Witch, Villager
+import secrets
+from roles import WOLF, SEER, WITCH, VILLAGER
+
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python 3.10 之前没有 int.bit_count
+    def popcount(mask):
+        return bin(mask).count("1")
+
+# 每个字节值中置位的位置，按字节查表把位集展开成座位号
+_BYTE_SEATS = [tuple(i for i in range(8) if byte >> i & 1) for byte in range(256)]
+
+
+def seats_of(mask):
+    """
+    位集中的座位号，从小到大
+    """
+    if mask < 256:
+        return _BYTE_SEATS[mask]
+    seats = []
+    base = 0
+    while mask:
+        seats.extend(base + i for i in _BYTE_SEATS[mask & 255])
+        mask >>= 8
+        base += 8
+    return seats
+
+
+class NightIntents:
+    """
+    一晚的行动意图，按座位号记录：各夜间子阶段只写入意图，不直接改动生死；
+    写入意图的子阶段全部完成后由 WerewolfGame.resolve_night（NightEvent.settle）一次结算
+    """
+    __slots__ = ("kill", "save", "poison", "shots")
 
-class WerewolfGame:
     def __init__(self):
+        self.kill = None      # 狼人击杀目标
+        self.save = None      # (女巫, 目标)
+        self.poison = None    # (女巫, 目标)
+        self.shots = []       # [(猎人, 目标)]
+
+    def copy(self):
+        intents = NightIntents()
+        intents.kill, intents.save, intents.poison = self.kill, self.save, self.poison
+        intents.shots = list(self.shots)
+        return intents
+
+
+class WerewolfGame:
+    __slots__ = ("players", "events", "day_count", "sheriff", "sheriff_elect", "wolf_kill_target",
+                 "human_wolf_votes", "winner", "log", "players_by_name", "all_mask", "alive_mask", "wolf_mask",
+                 "sheriff_mask", "knows", "checked", "night", "_alive_cache", "journal", "ai", "spectators", "seed",
+                 "_allocate_rng", "_ai_rng", "_tie_rng")
+
+    def __init__(self, seed=None, streams=None):
         self.players = []
         self.events = []
         self.day_count = 1
@@ -11,110 +63,386 @@ class WerewolfGame:
         self.sheriff_elect = False
         self.wolf_kill_target = None
         self.human_wolf_votes = defaultdict(int)
+        self.winner = None
+        # 输出函数，无头模拟时替换为空函数
+        self.log = print
+        # 索引：名字 -> 玩家。存活、阵营、警长标记按座位存为整数位集（第 seat 位），
+        # 候选列表与胜负判定都是位运算；Player.alive / sheriff 是位集的镜像，供逐个玩家读取
+        self.players_by_name = {}
+        self.all_mask = 0
+        self.alive_mask = 0
+        self.wolf_mask = 0
+        self.sheriff_mask = 0
+        # 每个座位的知识位集：knows 为该玩家知道完整身份的座位（狼人互知），checked 为预言家查验过的座位
+        self.knows = []
+        self.checked = []
+        # 当晚的行动意图，入夜时清空
+        self.night = NightIntents()
+        self._alive_cache = None
+        # 事件日志（EventLog），为 None 时不记录
+        self.journal = None
+        # AI 决策引擎（如 search_ai.SearchAI），为 None 时使用 roles.py 中的随机 AI
+        self.ai = None
+        # 观战分发（spectators.SpectatorHub），为 None 时没有观众
+        self.spectators = None
+        # 每局独立的随机种子，按用途分成互不影响的随机流：角色分配、AI 决策、平票裁决。
+        # 同一种子下对局逐步可复现，多房间进程中各房间也不再共用全局 random。
+        # 每个 random.Random 约 2.5 KB，随机流在第一次使用时才由种子派生，角色分配用完即丢弃。
+        # streams 直接给定这三个随机流，供推演等短命对局复用调用方的随机数生成器
+        if streams is not None:
+            self.seed = seed
+            self._allocate_rng, self._ai_rng, self._tie_rng = streams
+        else:
+            self.seed = secrets.randbits(64) if seed is None else seed
+            self._allocate_rng = self._ai_rng = self._tie_rng = None
+
+    def record(self, *event):
+        # 所有状态变化都经过这里写入事件日志，回放时按同样的顺序重建对局
+        if self.journal is not None:
+            self.journal.append(event)
+        if self.ai is not None:
+            self.ai.observe(event)
+        if self.spectators is not None:
+            self.spectators.publish_event(event)
+
     def random_allocate(self):
         num_players = len(self.players)
         roles = []
         werewolf_count = 2 if num_players >= 5 else 1
-        roles += [Wolf() for _ in range(werewolf_count)]
-        roles += [Seer(), Witch()]
-        roles += [Villager() for _ in range(num_players - len(roles))]
-        random.shuffle(roles)
+        roles += [WOLF] * werewolf_count
+        roles += [SEER, WITCH]
+        roles += [VILLAGER] * (num_players - len(roles))
+        rng = self._allocate_rng
+        if rng is None:
+            rng = random.Random(f"{self.seed}/allocate")
+        rng.shuffle(roles)
+        self.assign_roles(roles)
+
+    @property
+    def ai_rng(self):
+        if self._ai_rng is None:
+            self._ai_rng = random.Random(f"{self.seed}/ai")
+        return self._ai_rng
+
+    @property
+    def tie_rng(self):
+        if self._tie_rng is None:
+            self._tie_rng = random.Random(f"{self.seed}/tie")
+        return self._tie_rng
+
+    def assign_roles(self, roles):
+        self.record("allocate", [role.name for role in roles])
         for player, role in zip(self.players, roles):
             player.role = role
+            player.state = role.initial_state()
+        self.wolf_mask = sum(1 << p.seat for p in self.players if p.is_wolf())
+        self.knows = [self.wolf_mask if self.wolf_mask >> p.seat & 1 else 0 for p in self.players]
+        self.checked = [0] * len(self.players)
+
     def add_player(self, player):
+        player.seat = len(self.players)
         self.players.append(player)
+        self.players_by_name[player.name] = player
+        self.record("join", player.name, player.is_ai)
+        self.all_mask |= 1 << player.seat
+        if player.alive:
+            self.alive_mask |= 1 << player.seat
+            self._alive_cache = None
+
+    def get_player(self, name):
+        return self.players_by_name.get(name)
+
+    def player_at(self, seat):
+        return self.players[seat]
+
+    def _set_alive(self, player, alive):
+        # 所有生死变化的唯一入口：同步更新存活位集
+        if player.alive == alive:
+            return False
+        player.alive = alive
+        self.record("alive", player.seat, alive)
+        if alive:
+            self.alive_mask |= 1 << player.seat
+        else:
+            self.alive_mask &= ~(1 << player.seat)
+        self._alive_cache = None
+        return True
+
+    def kill(self, player):
+        return self._set_alive(player, False)
+
+    def kill_mask(self, mask):
+        # 一次结算多名死者：逐个记录事件，存活位集和存活列表缓存只更新一次
+        mask &= self.alive_mask
+        for seat in seats_of(mask):
+            self.players[seat].alive = False
+            self.record("alive", seat, False)
+        if mask:
+            self.alive_mask &= ~mask
+            self._alive_cache = None
+        return mask
+
+    def apply_night_result(self, player, result):
+        """
+        把 AI 角色返回的行动决定写成当晚的意图（女巫救人/毒人、猎人开枪），查验只影响信息，立即生效
+        """
+        action = result.get("action")
+        target = self.get_player(result.get("target"))
+        if not target:
+            return False
+        if action in ("save", "poison", "shoot"):
+            return self.intend(action, player, target)
+        if action == "check":
+            self.check(player, target)
+        return False
+
+    def intend(self, action, player, target):
+        """
+        记录一条夜间意图：解药只能救狼人今晚的目标，毒药和猎枪只能指向存活玩家，药必须还在
+        """
+        night = self.night
+        if action == "save":
+            if not player.state.has_antidote or night.save or target.seat != night.kill:
+                return False
+            night.save = (player.seat, target.seat)
+        elif action == "poison":
+            if not player.state.has_poison or night.poison or not target.alive:
+                return False
+            night.poison = (player.seat, target.seat)
+        elif action == "shoot":
+            if not self.hunter_triggered(player) or not target.alive:
+                return False
+            night.shots.append((player.seat, target.seat))
+        else:
+            return False
+        self.record("intent", action, player.seat, target.seat)
+        return True
+
+    def set_wolf_kill(self, target):
+        # 狼人的击杀只记为意图，同时告知女巫今晚的死者
+        self.wolf_kill_target = target.name if target else None
+        self.night.kill = target.seat if target else None
+        self.record("wolf_kill", self.night.kill)
+        for player in self.players:
+            if player.role is WITCH:
+                player.state.victim = self.wolf_kill_target
+
+    def resolve_night(self):
+        """
+        按击杀、解药、毒药、猎人触发的顺序一次结算当晚的意图，返回当晚死亡的位集
+        """
+        night = self.night
+        deaths = 1 << night.kill if night.kill is not None else 0
+        if night.save:
+            deaths &= ~(1 << night.save[1])
+        if night.poison:
+            deaths |= 1 << night.poison[1]
+        deaths = self.kill_mask(deaths)
+        if night.save:
+            self.use_potion(self.players[night.save[0]], "antidote")
+        if night.poison:
+            self.use_potion(self.players[night.poison[0]], "poison")
+        for seat in seats_of(deaths):
+            self.log(f"{self.players[seat].name} 在夜里死亡")
+        return deaths
+
+    def hunter_triggered(self, player):
+        # 被狼人击杀且未被救的猎人可以开枪，被毒死的猎人不能
+        night = self.night
+        return (player.seat == night.kill and not player.alive and player.is_hunter()
+                and not (night.poison and night.poison[1] == player.seat))
+
+    def resolve_shots(self):
+        for hunter, target in self.night.shots:
+            if self.kill(self.players[target]):
+                self.log(f"猎人 {self.players[hunter].name} 带走了 {self.players[target].name}")
+
+    def use_potion(self, player, potion):
+        setattr(player.state, "has_" + potion, False)
+        self.record("potion", player.seat, potion)
+
+    def cast_vote(self, voter, target, weight=1):
+        target.votes += weight
+        self.record("vote", voter.seat, target.seat, weight)
+
+    def check(self, seer, target):
+        # 预言家查验：只得知阵营，记入查验者的 checked 位集
+        self.checked[seer.seat] |= 1 << target.seat
+        self.record("check", seer.seat, target.seat)
+
+    def set_sheriff(self, player):
+        self.sheriff = player
+        player.sheriff = True
+        self.sheriff_mask |= 1 << player.seat
+        self.record("sheriff", player.seat)
+
+    def players_in(self, mask):
+        return [self.players[seat] for seat in seats_of(mask)]
+
+    def alive_players(self):
+        if self._alive_cache is None:
+            self._alive_cache = self.players_in(self.alive_mask)
+        return self._alive_cache
+
+    def dead_players(self):
+        return self.players_in(self.all_mask & ~self.alive_mask)
+
+    def alive_wolves(self):
+        return self.players_in(self.alive_mask & self.wolf_mask)
+
+    def alive_villagers(self):
+        return self.players_in(self.alive_mask & ~self.wolf_mask)
 
     def elect_sheriff(self):
         rounds = 3
         for round_number in range(1, rounds + 1):
-            max_votes = max(p.votes for p in self.players if p.alive)
-            candidates = [p for p in self.players if p.alive and p.votes == max_votes]
+            alive_players = self.alive_players()
+            max_votes = max(p.votes for p in alive_players)
+            candidates = [p for p in alive_players if p.votes == max_votes]
             
             if len(candidates) == 1:
-                self.sheriff = candidates[0]
-                self.sheriff.sheriff = True
-                print(f"\n{self.sheriff.name} 当选警长！")
+                self.set_sheriff(candidates[0])
+                self.sheriff_elect = True
+                self.record("sheriff_elect")
+                self.log(f"\n{self.sheriff.name} 当选警长！")
                 self._reset_votes()
                 return
             
-            print(f"第 {round_number} 轮选举没有选出警长。")
+            self.log(f"第 {round_number} 轮选举没有选出警长。")
             
             self._reset_votes()
         
-        print("警长选举失败，本局没有警长")
+        self.sheriff_elect = True
+        self.record("sheriff_elect")
+        self.log("警长选举失败，本局没有警长")
 
     def _reset_votes(self):
         for p in self.players:
             p.votes = 0
+        self.record("reset_votes")
 
     def vote(self):
-        alive_players = [p for p in self.players if p.alive]
+        alive_players = self.alive_players()
         max_votes = max(p.votes for p in alive_players)
         candidates = [p for p in alive_players if p.votes == max_votes]
         
         if len(candidates) == 1:
             killed = candidates[0]
-            killed.alive = False
-            print(f"\n{killed.name} 被投票出局")
+            self.kill(killed)
+            self.log(f"\n{killed.name} 被投票出局")
             if killed.sheriff:
                 self.transfer_sheriff()
         else:
-            print("平票，无人出局")
+            self.log("平票，无人出局")
             
         self._reset_votes()
 
     def transfer_sheriff(self):
-        candidates = [p for p in self.players if p.alive and not p.sheriff]
+        candidates = self.players_in(self.alive_mask & ~self.sheriff_mask)
         if candidates:
-            new_sheriff = random.choice(candidates)
-            self.sheriff = new_sheriff
-            new_sheriff.sheriff = True
-            print(f"{new_sheriff.name} 成为新警长！")
+            new_sheriff = self.tie_rng.choice(candidates)
+            self.set_sheriff(new_sheriff)
+            self.log(f"{new_sheriff.name} 成为新警长！")
         else:
-            print("没有合适玩家继承警徽")
+            self.log("没有合适玩家继承警徽")
 
     def check_game_end(self):
-        alive_werewolves = sum(1 for p in self.players if p.is_wolf() and p.alive)
-        alive_villagers = sum(1 for p in self.players if not p.is_wolf() and p.alive)
-        
+        alive_werewolves = popcount(self.alive_mask & self.wolf_mask)
+        alive_villagers = popcount(self.alive_mask & ~self.wolf_mask)
+
         if alive_werewolves == 0:
-            print("\n好人阵营胜利！")
+            self.winner = "villagers"
+            self.record("winner", self.winner)
+            self.log("\n好人阵营胜利！")
             return True
         elif alive_werewolves >= alive_villagers:
-            print("\n狼人阵营胜利！")
+            self.winner = "wolves"
+            self.record("winner", self.winner)
+            self.log("\n狼人阵营胜利！")
             return True
         return False
 
+    def ai_sheriff_votes(self, humans=()):
+        valid_candidates = [p for p in self.alive_players() if p not in humans]
+        for voter in valid_candidates:
+            if self.ai is not None:
+                target = self.ai.sheriff_vote(voter, valid_candidates)
+            else:
+                target = self.ai_rng.choice(valid_candidates)
+            self.cast_vote(voter, target)
+            self.log(f"{voter.name, voter.role.name} 投票给 {target.name}")
+
+    def ai_day_votes(self):
+        alive_players = self.alive_players()
+        for voter in alive_players:
+            if voter.is_ai:
+                vote_candidates = [p for p in alive_players if p != voter]
+                if vote_candidates:
+                    if self.ai is not None:
+                        target = self.ai.day_vote(voter, vote_candidates)
+                    else:
+                        target = self.ai_rng.choice(vote_candidates)
+                    self.cast_vote(voter, target)
+                    self.log(f"{voter.name} ({voter.role.name}) 投票给 {target.name}")
+                else:
+                    self.log(f"{voter.name} 没有可投票的目标")
+
+    def ai_night_actions(self, role_check, label):
+        for player in self.alive_players():
+            if role_check(player) and player.is_ai:
+                action_result = self.ai_night_action(player)
+                if action_result:
+                    self.apply_night_result(player, action_result)
+                    self.log(f"{label} {player.name} (AI) 执行行动: {action_result}")
+
+    def begin_night(self):
+        self.night = NightIntents()
+        self.record("night", self.day_count)
+
+    def ai_hunter_actions(self):
+        # 夜间结算后触发的 AI 猎人选择开枪目标，只有狼人的击杀目标可能触发
+        if self.night.kill is not None:
+            player = self.players[self.night.kill]
+            if player.is_ai and self.hunter_triggered(player):
+                action_result = player.day_action(self.players, self.ai_rng)
+                if action_result:
+                    self.apply_night_result(player, action_result)
+                    self.log(f"猎人 {player.name} (AI) 执行行动: {action_result}")
+
+    def ai_night_action(self, player):
+        if self.ai is not None:
+            return self.ai.night_action(player)
+        return player.night_action(self.players, self.ai_rng)
+
     def day_actions(self):
-        print(f"第 {self.day_count} 天白天")
+        self.log(f"第 {self.day_count} 天白天")
         self.day_count += 1
+        self.record("day", self.day_count)
 
     def night_actions(self):
-        print(f"第 {self.day_count} 天黑夜")
-        self.wolf_kill_target = None
+        self.log(f"第 {self.day_count} 天黑夜")
 
         votes = defaultdict(int)
-        for player in self.players:
-            if player.is_wolf() and player.alive and player.is_ai:  
-                action_result = player.night_action(self.players)
+        for player in self.alive_wolves():
+            if player.is_ai:
+                action_result = self.ai_night_action(player)
                 if action_result and "vote" in action_result:
                     target_name = action_result["vote"]
                     votes[target_name] += 1
-                    print(f"{player.name} votes for {target_name}")
+                    self.log(f"{player.name} votes for {target_name}")
 
         for target_name, count in self.human_wolf_votes.items():
             votes[target_name] += count
 
-        print(f"狼人投票结果: {votes}")
+        self.log(f"狼人投票结果: {votes}")
+        target = None
         if votes:
             max_votes = max(votes.values())
             candidates = [name for name, count in votes.items() if count == max_votes]
-            self.wolf_kill_target = random.choice(candidates) if candidates else None
+            target = self.get_player(self.tie_rng.choice(candidates)) if candidates else None
         
-        if self.wolf_kill_target:
-            target = next((p for p in self.players if p.name == self.wolf_kill_target), None)
-            if target:
-                target.alive = False
-                print(f"狼人击杀了 {target.name}")
+        self.set_wolf_kill(target)
+        if target:
+            self.log(f"狼人选择击杀 {target.name}")
         
         self.human_wolf_votes.clear()
\ No newline at end of file
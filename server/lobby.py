@@ -0,0 +1,136 @@
+import asyncio
+import itertools
+from protocol import read_frame
+
+TABLE_SIZE = 8
+MIN_ROOM_SIZE = 2
+
+
+class Room:
+    def __init__(self, room_id, size):
+        self.room_id = room_id
+        self.size = size
+        self.names = []
+        self.connections = []
+        self.codecs = []
+        self.tokens = []
+        # 开局前每个座位一个监视任务，连接断开时让出座位
+        self.watchers = []
+        self.session = None
+        self.task = None
+
+    def add(self, name, reader, writer, codec, token):
+        self.names.append(name)
+        self.connections.append((reader, writer))
+        self.codecs.append(codec)
+        self.tokens.append(token)
+
+    def remove(self, token):
+        index = self.tokens.index(token)
+        for seats in (self.names, self.connections, self.codecs, self.tokens, self.watchers):
+            del seats[index]
+        return index
+
+    def is_full(self):
+        return len(self.connections) >= self.size
+
+
+class Lobby:
+    """
+    房间管理：按玩家选择的人数把连接分进房间，房间满员后开局，对局结束后销毁房间。
+    每个房间拥有独立的 session（以及其中的 WerewolfGame），互不共享状态
+    """
+    def __init__(self, session_factory, default_size=TABLE_SIZE):
+        self.session_factory = session_factory
+        self.default_size = default_size
+        self.rooms = {}
+        self.open_rooms = {}
+        # 会话令牌 -> (房间, 座位序号)，断线重连时据此找回原座位
+        self.sessions = {}
+        self.room_ids = itertools.count(1)
+
+    def room_size(self, requested):
+        try:
+            size = int(requested)
+        except (TypeError, ValueError):
+            return self.default_size
+        return max(MIN_ROOM_SIZE, min(TABLE_SIZE, size))
+
+    def join(self, name, reader, writer, codec, token, requested_size=None):
+        size = self.room_size(requested_size)
+        room = self.open_rooms.get(size)
+        if room is None:
+            room = Room(next(self.room_ids), size)
+            self.rooms[room.room_id] = room
+            self.open_rooms[size] = room
+        room.add(name, reader, writer, codec, token)
+        room.watchers.append(asyncio.create_task(self.watch(room, token, reader, writer)))
+        self.sessions[token] = (room, len(room.connections) - 1)
+        if room.is_full():
+            del self.open_rooms[size]
+            self.start_room(room)
+        return room
+
+    async def watch(self, room, token, reader, writer):
+        """
+        等待开局期间监视玩家连接：开局前玩家不会发送消息，收到的帧直接丢弃；
+        连接断开时让出座位，避免房间带着已断开的座位开局
+        """
+        try:
+            while True:
+                await read_frame(reader)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        self.leave(room, token)
+        writer.close()
+
+    def leave(self, room, token):
+        room.remove(token)
+        self.sessions.pop(token, None)
+        # 后面的座位前移，重新登记座位序号
+        for index, remaining in enumerate(room.tokens):
+            self.sessions[remaining] = (room, index)
+        print(f"房间 {room.room_id} 有玩家在开局前断开 ({len(room.connections)}/{room.size})")
+        if not room.connections:
+            self.rooms.pop(room.room_id, None)
+            if self.open_rooms.get(room.size) is room:
+                del self.open_rooms[room.size]
+
+    def start_room(self, room):
+        # 开局后由对局的读取任务接管连接
+        for watcher in room.watchers:
+            watcher.cancel()
+        room.watchers = []
+        # 真人不足一桌时由 AI 补足
+        room.session = self.session_factory(room.connections, room.names, room.codecs, TABLE_SIZE - room.size)
+        room.task = asyncio.create_task(self.run_room(room))
+        print(f"房间 {room.room_id} 开局 ({room.size} 名真人玩家)")
+
+    async def run_room(self, room):
+        try:
+            await room.session.start()
+        except Exception as e:
+            print(f"房间 {room.room_id} 游戏异常结束: {e}")
+        finally:
+            self.teardown(room)
+
+    def resume(self, token):
+        return self.sessions.get(token)
+
+    def teardown(self, room):
+        if room.session:
+            room.session.close()
+        for token in room.tokens:
+            self.sessions.pop(token, None)
+        self.rooms.pop(room.room_id, None)
+        if self.open_rooms.get(room.size) is room:
+            del self.open_rooms[room.size]
+        print(f"房间 {room.room_id} 已关闭")
+
+    def stats(self):
+        playing = sum(1 for room in self.rooms.values() if room.task)
+        return {
+            "rooms": len(self.rooms),
+            "playing": playing,
+            "waiting_players": sum(len(room.connections) for room in self.open_rooms.values()),
+        }
@@ -0,0 +1,195 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 耗时类指标的分桶上限（秒），覆盖编解码的微秒级到真人思考的几十秒
+TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "werewolf_phase_seconds": "各阶段（警长选举、白天投票、夜间各角色子阶段）耗时",
+    "werewolf_response_seconds": "真人玩家从收到提示到回复的耗时",
+    "werewolf_response_timeouts_total": "超时未回复按默认行动处理的次数",
+    "werewolf_encode_seconds": "消息编码耗时",
+    "werewolf_decode_seconds": "消息解码耗时",
+    "werewolf_sent_bytes_total": "发送字节数",
+    "werewolf_received_bytes_total": "接收字节数",
+    "werewolf_active_rooms": "正在进行或等待开局的房间数",
+    "werewolf_threads": "服务端进程的线程数",
+    "werewolf_ai_decision_seconds": "搜索 AI 每次决策的耗时",
+    "werewolf_spectators": "当前在线的观众数",
+    "werewolf_spectator_lags_total": "观众跟不上直播、积压被丢弃并改发快照的次数",
+    "werewolf_spectator_drops_total": "屡次跟不上直播被断开的观众数",
+}
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(TIME_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(TIME_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Timer:
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class NullRegistry:
+    """
+    未开启指标时使用的空实现，埋点处的调用都是空操作
+    """
+    enabled = False
+
+    def inc(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, value, **labels):
+        pass
+
+    def time(self, name, **labels):
+        return NULL_TIMER
+
+    def gauge(self, name, read):
+        pass
+
+
+class Registry:
+    enabled = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def time(self, name, **labels):
+        return Timer(self, name, labels)
+
+    def gauge(self, name, read):
+        # 仪表盘类指标在抓取时才调用 read 读取当前值
+        self.gauges[name] = read
+
+    def render(self):
+        """
+        按 Prometheus 文本格式输出所有指标
+        """
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(h.counts), h.sum, h.count) for key, h in histograms]
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), counts, total, count in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, bucket in zip(TIME_BUCKETS, counts):
+                cumulative += bucket
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+        for name, read in sorted(self.gauges.items()):
+            header(name, "gauge")
+            lines.append(f"{name} {read()}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+registry = NullRegistry()
+
+
+def enable():
+    global registry
+    if not registry.enabled:
+        registry = Registry()
+    return registry
+
+
+def serve(port, host="127.0.0.1"):
+    """
+    开启指标并在本地 HTTP 端口的 /metrics 上提供 Prometheus 文本格式输出
+    """
+    enable()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    print(f"指标服务: http://{host}:{port}/metrics")
+    return httpd
@@ -1,22 +1,29 @@
-from roles import Wolf, Villager, Seer, Witch
+import random
+from roles import Wolf, Villager, Seer, Witch, Hunter
 
 class Player:
+    __slots__ = ("name", "role", "state", "is_ai", "seat", "alive", "votes", "sheriff")
+
     def __init__(self, name, is_ai=False):
         self.name = name
         self.role = None
+        # 座位上的可变角色状态（如女巫的药），由角色的 initial_state 创建
+        self.state = None
         self.is_ai = is_ai
+        self.seat = None
+        # 存活状态只能通过 WerewolfGame.kill / kill_mask 修改
         self.alive = True
         self.votes = 0
         self.sheriff = False
 
-    def night_action(self, all_players):
+    def night_action(self, all_players, rng=random):
         if self.role:
-            return self.role.night_action(self, all_players)
+            return self.role.night_action(self, all_players, rng)
         return None
 
-    def day_action(self, all_players):
+    def day_action(self, all_players, rng=random):
         if self.role:
-            return self.role.day_action(self, all_players)
+            return self.role.day_action(self, all_players, rng)
         return None
     
     def is_wolf(self):
@@ -29,4 +36,7 @@ class Player:
         return isinstance(self.role, Witch)
     
     def is_villager(self):
-        return isinstance(self.role, Villager)
\ No newline at end of file
+        return isinstance(self.role, Villager)
+
+    def is_hunter(self):
+        return isinstance(self.role, Hunter)
\ No newline at end of file
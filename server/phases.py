@@ -0,0 +1,116 @@
+# 各阶段的提示消息构造与回复处理，线程版和 asyncio 版服务端共用
+
+def sheriff_prompt(game):
+    return {
+        "type": "sheriff_election",
+        "candidates": [p.name for p in game.alive_players()]
+    }
+
+
+def apply_sheriff_vote(game, player, response):
+    if not response or "vote" not in response:
+        return
+    target = game.get_player(response["vote"])
+    if target:
+        game.cast_vote(player, target)
+
+
+def day_vote_prompt(game, player):
+    return {
+        "type": "day_vote",
+        "candidates": [p.name for p in game.alive_players() if p != player]
+    }
+
+
+def apply_day_vote(game, player, response):
+    if not response or "vote" not in response:
+        return
+    target = game.get_player(response["vote"])
+    if target:
+        game.cast_vote(player, target, 1.5 if player.sheriff else 1)
+        game.log(f"{player.name} ({player.role.name}) 投票给 {target.name}")
+
+
+def night_prompt(game, player, role_type):
+    if role_type == "werewolf":
+        return {
+            "type": "night_action",
+            "action": "werewolf",
+            "candidates": [p.name for p in game.alive_villagers()]
+        }
+    if role_type == "witch":
+        return {
+            "type": "night_action",
+            "action": "witch",
+            "has_poison": player.state.has_poison,
+            "has_antidote": player.state.has_antidote,
+            "wolf_target": game.wolf_kill_target,
+            "alive_players": [p.name for p in game.alive_players() if p != player]
+        }
+    return {
+        "type": "night_action",
+        "action": role_type,
+        "candidates": [p.name for p in game.alive_players() if p != player]
+    }
+
+
+def apply_night_response(game, player, role_type, response):
+    """
+    处理真人玩家的夜间行动回复，需要私下回传给该玩家的消息（如查验结果）作为返回值
+    """
+    if not response:
+        return None
+
+    if role_type == "werewolf":
+        if "target" in response:
+            # 只接受存活的好人，同伴或不存在的名字按弃权处理
+            target = game.get_player(response["target"])
+            if target and target.alive and not target.is_wolf():
+                game.human_wolf_votes[target.name] += 1
+                game.record("wolf_vote", player.seat, target.name)
+                game.log(f"狼人 {player.name} (真人) 选择击杀 {target.name}")
+
+    elif role_type == "witch":
+        if response.get("save"):
+            target_name = response["save"]
+            target = game.get_player(target_name)
+            if target and game.intend("save", player, target):
+                game.log(f"女巫 {player.name} (真人) 对 {target_name} 使用解药")
+        if response.get("poison"):
+            target_name = response["poison"]
+            target = game.get_player(target_name)
+            if target and game.intend("poison", player, target):
+                game.log(f"女巫 {player.name} (真人) 对 {target_name} 使用毒药")
+
+    elif role_type == "seer":
+        if "target" in response:
+            target_name = response["target"]
+            target = game.get_player(target_name)
+            if target and target.alive and target is not player:
+                game.check(player, target)
+                return {
+                    "type": "seer_result",
+                    "action": "seer",
+                    "target": target_name,
+                    "result": "狼人" if target.is_wolf() else "好人",
+                }
+
+    elif role_type == "hunter":
+        if "target" in response:
+            target_name = response["target"]
+            target = game.get_player(target_name)
+            if target and game.intend("shoot", player, target):
+                game.log(f"猎人 {player.name} (真人) 选择带走 {target_name}")
+    return None
+
+
+def default_response(game, player, phase_name):
+    """
+    玩家超时未回复时的默认行动：狼人随机选择一名好人，其余阶段视为弃权
+    """
+    if phase_name == "werewolf":
+        candidates = game.alive_villagers()
+        if candidates:
+            return {"target": game.ai_rng.choice(candidates).name}
+    return {}
+
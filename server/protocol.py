@@ -0,0 +1,278 @@
+import json
+import struct
+
+# 帧格式: 4 字节大端长度 + 消息体；消息体默认是 UTF-8 JSON，握手时可协商为二进制编码
+HEADER = struct.Struct("!I")
+DOUBLE = struct.Struct("!d")
+MAX_FRAME_SIZE = 1 << 20
+
+
+class JsonCodec:
+    name = "json"
+
+    def encode(self, message):
+        return json.dumps(message).encode()
+
+    def decode(self, body):
+        return json.loads(body)
+
+    def encode_fields(self, fields):
+        # 只编码字典的若干字段，用于和其他已编码字段拼接成一条消息
+        return json.dumps(fields)[1:-1].encode()
+
+    def join_fields(self, parts, count):
+        return b"{" + b", ".join(parts) + b"}"
+
+    def set_roster(self, names):
+        pass
+
+
+# 二进制编码的值类型标记
+NONE, TRUE, FALSE, INT, FLOAT, STR, LIST, DICT, SYMBOL, SEAT = range(10)
+
+# 常用字段名和字符串取值（消息类型、角色名、行动名等）编码为整数编号，新增项只能追加在末尾
+KEYS = [
+    "type", "name", "room_size", "codec", "confirm", "players", "candidates", "vote", "target",
+    "save", "poison", "action", "has_poison", "has_antidote", "dead_players", "alive_players",
+    "result", "role", "seat", "day_count", "version", "base", "changes", "phase", "room", "size",
+    "wolf_target",
+]
+SYMBOLS = [
+    "wait_confirm", "game_cancelled", "game_status", "status_delta", "game_end", "sheriff_election",
+    "day_vote", "night_action", "seer_result", "room_joined", "roster", "resync", "welcome",
+    "werewolf", "witch", "seer", "hunter", "check", "shoot", "alive", "sheriff", "day_count",
+    "狼人", "平民", "女巫", "预言家", "猎人", "未知", "好人",
+]
+KEY_IDS = {key: i + 1 for i, key in enumerate(KEYS)}
+SYMBOL_IDS = {symbol: i for i, symbol in enumerate(SYMBOLS)}
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class BinaryCodec:
+    """
+    紧凑二进制编码：消息类型、字段名、角色名用整数编号，玩家名用座位号代替。
+    座位表由服务端在分配角色后通过 roster 消息下发，双方收发 roster 后同步
+    """
+    name = "binary"
+
+    def __init__(self):
+        self.roster = []
+        self.seats = {}
+
+    def set_roster(self, names):
+        self.roster = list(names)
+        self.seats = {name: seat for seat, name in enumerate(self.roster)}
+
+    def encode(self, message):
+        out = bytearray()
+        self.write(out, message)
+        return bytes(out)
+
+    def decode(self, body):
+        try:
+            message, _ = self.read(body, 0)
+        except (IndexError, UnicodeDecodeError, struct.error) as e:
+            raise ValueError(f"二进制消息解码失败: {e}")
+        if isinstance(message, dict) and message.get("type") == "roster":
+            self.set_roster(message["players"])
+        return message
+
+    def encode_fields(self, fields):
+        out = bytearray()
+        for key, value in fields.items():
+            self.write_key(out, key)
+            self.write(out, value)
+        return bytes(out)
+
+    def join_fields(self, parts, count):
+        out = bytearray([DICT])
+        write_varint(out, count)
+        return bytes(out) + b"".join(parts)
+
+    def write_key(self, out, key):
+        key_id = KEY_IDS.get(key)
+        if key_id:
+            write_varint(out, key_id)
+        else:
+            out.append(0)
+            self.write_str(out, key)
+
+    def write_str(self, out, value):
+        data = value.encode()
+        write_varint(out, len(data))
+        out += data
+
+    def write(self, out, value):
+        if value is None:
+            out.append(NONE)
+        elif value is True:
+            out.append(TRUE)
+        elif value is False:
+            out.append(FALSE)
+        elif isinstance(value, int):
+            out.append(INT)
+            write_varint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+        elif isinstance(value, float):
+            out.append(FLOAT)
+            out += DOUBLE.pack(value)
+        elif isinstance(value, str):
+            seat = self.seats.get(value)
+            symbol = SYMBOL_IDS.get(value)
+            if seat is not None:
+                out.append(SEAT)
+                write_varint(out, seat)
+            elif symbol is not None:
+                out.append(SYMBOL)
+                write_varint(out, symbol)
+            else:
+                out.append(STR)
+                self.write_str(out, value)
+        elif isinstance(value, (list, tuple)):
+            out.append(LIST)
+            write_varint(out, len(value))
+            for item in value:
+                self.write(out, item)
+        elif isinstance(value, dict):
+            out.append(DICT)
+            write_varint(out, len(value))
+            for key, item in value.items():
+                self.write_key(out, key)
+                self.write(out, item)
+        else:
+            raise TypeError(f"无法编码的类型: {type(value).__name__}")
+
+    def read_str(self, data, pos):
+        length, pos = read_varint(data, pos)
+        if pos + length > len(data):
+            raise IndexError("字符串越界")
+        return bytes(data[pos:pos + length]).decode(), pos + length
+
+    def read(self, data, pos):
+        tag = data[pos]
+        pos += 1
+        if tag == NONE:
+            return None, pos
+        if tag == TRUE:
+            return True, pos
+        if tag == FALSE:
+            return False, pos
+        if tag == INT:
+            value, pos = read_varint(data, pos)
+            return (value >> 1) if not value & 1 else -((value + 1) >> 1), pos
+        if tag == FLOAT:
+            return DOUBLE.unpack_from(data, pos)[0], pos + DOUBLE.size
+        if tag == STR:
+            return self.read_str(data, pos)
+        if tag == SYMBOL:
+            index, pos = read_varint(data, pos)
+            return SYMBOLS[index], pos
+        if tag == SEAT:
+            seat, pos = read_varint(data, pos)
+            return self.roster[seat], pos
+        if tag == LIST:
+            count, pos = read_varint(data, pos)
+            items = []
+            for _ in range(count):
+                item, pos = self.read(data, pos)
+                items.append(item)
+            return items, pos
+        if tag == DICT:
+            count, pos = read_varint(data, pos)
+            result = {}
+            for _ in range(count):
+                key_id, pos = read_varint(data, pos)
+                if key_id:
+                    key = KEYS[key_id - 1]
+                else:
+                    key, pos = self.read_str(data, pos)
+                result[key], pos = self.read(data, pos)
+            return result, pos
+        raise IndexError(f"未知类型标记: {tag}")
+
+
+CODECS = {"json": JsonCodec, "binary": BinaryCodec}
+JSON = JsonCodec()
+
+
+def make_codec(name):
+    # 不认识的编码一律回退到 JSON，兼容旧客户端
+    return CODECS.get(name, JsonCodec)()
+
+
+def frame(body):
+    return HEADER.pack(len(body)) + body
+
+
+def encode_message(message, codec=JSON):
+    return frame(codec.encode(message))
+
+
+def decode_message(body, codec=JSON):
+    # 协议消息一律是对象；能解码但不是对象的帧（如 [1, 2]）与无法解析的帧同样视为错误
+    message = codec.decode(body)
+    if not isinstance(message, dict):
+        raise ValueError(f"消息不是对象: {type(message).__name__}")
+    return message
+
+
+class FrameDecoder:
+    """
+    增量解码器：按收到的字节流切分出完整的帧，不完整的部分留在缓冲区等待后续数据，
+    无法解析的帧会被跳过并计入 dropped。
+    收到服务端的 welcome 消息后，后续帧改用其中协商好的编码解析
+    """
+    def __init__(self, codec=None):
+        self.buffer = bytearray()
+        self.dropped = 0
+        self.codec = codec or JsonCodec()
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        offset = 0
+        while len(self.buffer) - offset >= HEADER.size:
+            (length,) = HEADER.unpack_from(self.buffer, offset)
+            if length > MAX_FRAME_SIZE:
+                raise ValueError(f"帧长度超出限制: {length}")
+            end = offset + HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            try:
+                message = decode_message(bytes(self.buffer[offset + HEADER.size:end]), self.codec)
+            except ValueError:
+                self.dropped += 1
+            else:
+                messages.append(message)
+                if message.get("type") == "welcome":
+                    self.codec = make_codec(message.get("codec"))
+            offset = end
+        del self.buffer[:offset]
+        return messages
+
+
+async def read_frame(reader):
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"帧长度超出限制: {length}")
+    return await reader.readexactly(length)
+
+
+async def read_message(reader, codec=JSON):
+    return decode_message(await read_frame(reader), codec)
@@ -0,0 +1,71 @@
+import argparse
+import time
+from eventlog import read_events, recover, replay, snapshot_game
+
+
+def describe(event, names):
+    kind = event[0]
+    if kind == "header":
+        return f"日志版本 {event[1]}，随机种子 {event[2]}"
+    if kind == "join":
+        return f"{event[1]} 加入对局{' (AI)' if event[2] else ''}"
+    if kind == "allocate":
+        return "角色分配: " + ", ".join(f"{name}={role}" for name, role in zip(names, event[1]))
+    if kind == "alive":
+        return f"{names[event[1]]} {'复活' if event[2] else '死亡'}"
+    if kind == "vote":
+        return f"{names[event[1]]} 投票给 {names[event[2]]} ({event[3]} 票)"
+    if kind == "sheriff":
+        return f"{names[event[1]]} 成为警长"
+    if kind == "potion":
+        return f"女巫 {names[event[1]]} 使用了{'解药' if event[2] == 'antidote' else '毒药'}"
+    if kind == "check":
+        return f"预言家 {names[event[1]]} 查验了 {names[event[2]]}"
+    if kind == "wolf_vote":
+        return f"狼人 {names[event[1]]} 选择击杀 {event[2]}"
+    if kind == "wolf_kill":
+        return f"狼人击杀目标: {names[event[1]] if event[1] is not None else '无'}"
+    if kind == "intent":
+        target = names[event[3]]
+        action = {"save": f"对 {target} 使用解药", "poison": f"对 {target} 使用毒药", "shoot": f"开枪带走 {target}"}
+        return f"{names[event[2]]} 选择{action[event[1]]}"
+    if kind == "night":
+        return f"第 {event[1]} 天黑夜开始"
+    if kind == "day":
+        return f"进入第 {event[1]} 天"
+    if kind == "winner":
+        return f"{'好人' if event[1] == 'villagers' else '狼人'}阵营胜利"
+    return " ".join(str(item) for item in event)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="狼人杀对局日志回放")
+    parser.add_argument("log", help="事件日志文件")
+    parser.add_argument("--events", action="store_true", help="逐条打印事件")
+    parser.add_argument("--verify", action="store_true", help="校验快照恢复与完整回放的结果一致")
+    args = parser.parse_args()
+
+    if args.events:
+        names = []
+        for event in read_events(args.log):
+            if event[0] == "join":
+                names.append(event[1])
+            if event[0] not in ("reset_votes", "sheriff_elect"):
+                print(describe(event, names))
+
+    start = time.perf_counter()
+    game = recover(args.log)
+    elapsed = time.perf_counter() - start
+    print(f"\n恢复耗时: {elapsed * 1000:.2f} ms")
+    print(f"第 {game.day_count} 天，胜者: {game.winner or '未结束'}")
+    for p in game.players:
+        role = p.role.name if p.role else "未分配"
+        print(f"{p.name}: {role} {'存活' if p.alive else '死亡'}{' 警长' if p is game.sheriff else ''}")
+
+    if args.verify:
+        same = snapshot_game(replay(args.log)) == snapshot_game(game)
+        print("校验通过：快照恢复与完整回放一致" if same else "校验失败：快照恢复与完整回放不一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,82 +2,107 @@ from abc import ABC, abstractmethod
 import random
 
 class Role(ABC):
+    """
+    角色对象不保存任何对局状态，同一种角色在所有玩家、所有房间间共享一个实例；
+    需要随玩家变化的状态（如女巫的药）放在 initial_state 返回的座位记录里。
+    AI 决策使用调用方传入的 rng（对局的 AI 随机流），不传时使用全局 random
+    """
+    __slots__ = ("name",)
+
     def __init__(self, name):
         self.name = name
+
+    def initial_state(self):
+        return None
+
     @abstractmethod
-    def night_action(self, player, all_players):
+    def night_action(self, player, all_players, rng=random):
         pass
     @abstractmethod
-    def day_action(self, player, all_players):
+    def day_action(self, player, all_players, rng=random):
         pass
 
 class Wolf(Role):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__("狼人")
         
-    def night_action(self, player, all_players):
+    def night_action(self, player, all_players, rng=random):
         if player.is_ai:
             valid_targets = [p for p in all_players if p.alive and not p.is_wolf()]
             if valid_targets:
-                target = random.choice(valid_targets)
+                target = rng.choice(valid_targets)
                 return {"vote": target.name}
         return None
         
-    def day_action(self, player, all_players):
+    def day_action(self, player, all_players, rng=random):
         return None
 
 class Villager(Role):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__("平民")
         
-    def night_action(self, player, all_players):
+    def night_action(self, player, all_players, rng=random):
         return None
         
-    def day_action(self, player, all_players):
+    def day_action(self, player, all_players, rng=random):
         return None
 
-class Witch(Role):
+class WitchState:
+    __slots__ = ("has_poison", "has_antidote", "victim")
+
     def __init__(self):
-        super().__init__("女巫")
         self.has_poison = True
         self.has_antidote = True
-        
-    def night_action(self, player, all_players):
+        # 当晚狼人击杀的玩家名字，女巫用解药时只能救这名玩家
+        self.victim = None
+
+
+class Witch(Role):
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__("女巫")
+
+    def initial_state(self):
+        return WitchState()
+
+    def night_action(self, player, all_players, rng=random):
         if not player.is_ai:
             return None
             
-        if player.is_ai and self.has_antidote:
-            dead_players = [p for p in all_players if not p.alive and not p.is_wolf()]
-            if dead_players and random.random() < 0.7:  
-                target = random.choice(dead_players)
-                target.alive = True
-                self.has_antidote = False
-                return {"action": "save", "target": target.name}
+        if player.is_ai and player.state.has_antidote:
+            victims = [p for p in all_players if p.name == player.state.victim and not p.is_wolf()]
+            if victims and rng.random() < 0.7:  
+                return {"action": "save", "target": victims[0].name}
                 
-        if player.is_ai and self.has_poison:
+        if player.is_ai and player.state.has_poison:
             valid_targets = [p for p in all_players if p.alive and p.is_wolf()]
-            if valid_targets and random.random() < 0.3: 
-                target = random.choice(valid_targets)
-                target.alive = False
-                self.has_poison = False
+            if valid_targets and rng.random() < 0.3: 
+                target = rng.choice(valid_targets)
                 return {"action": "poison", "target": target.name}
                 
         return None
         
-    def day_action(self, player, all_players):
+    def day_action(self, player, all_players, rng=random):
         return None
 
 class Seer(Role):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__("预言家")
         
-    def night_action(self, player, all_players):
+    def night_action(self, player, all_players, rng=random):
         if not player.is_ai:
             return None
             
         valid_targets = [p for p in all_players if p.alive and p != player]
         if valid_targets:
-            target = random.choice(valid_targets)
+            target = rng.choice(valid_targets)
             result = "狼人" if target.is_wolf() else "好人"
             return {
                 "action": "check",
@@ -86,40 +111,42 @@ class Seer(Role):
             }
         return None
         
-    def day_action(self, player, all_players):
+    def day_action(self, player, all_players, rng=random):
         return None
 
 class Hunter(Role):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__("猎人")
         
-    def night_action(self, player, all_players):
+    def night_action(self, player, all_players, rng=random):
         return None
         
-    def day_action(self, player, all_players):
+    def day_action(self, player, all_players, rng=random):
         if not player.alive:
             if not player.is_ai:
                 return None
                 
             valid_targets = [p for p in all_players if p.alive and p != player]
             if valid_targets:
-                target = random.choice(valid_targets)
-                target.alive = False
-                return {"target": target.name}
+                target = rng.choice(valid_targets)
+                return {"action": "shoot", "target": target.name}
         return None
 
+WOLF = Wolf()
+VILLAGER = Villager()
+WITCH = Witch()
+SEER = Seer()
+HUNTER = Hunter()
+
+ROLES = {role.name: role for role in (WOLF, VILLAGER, WITCH, SEER, HUNTER)}
+
 def create_role(role_name):
     """
-    根据角色名创建对应的角色实例
+    根据角色名返回对应的共享角色实例
     """
-    role_map = {
-        "狼人": Wolf,
-        "平民": Villager,
-        "女巫": Witch,
-        "预言家": Seer,
-        "猎人": Hunter
-    }
-    role_class = role_map.get(role_name)
-    if role_class:
-        return role_class()
+    role = ROLES.get(role_name)
+    if role:
+        return role
     raise ValueError(f"未知角色: {role_name}")
\ No newline at end of file
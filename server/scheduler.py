@@ -0,0 +1,57 @@
+import itertools
+import time
+import metrics
+
+# 各阶段等待真人玩家的最长时间（秒）
+PHASE_DEADLINES = {
+    "sheriff_election": 30.0,
+    "werewolf": 30.0,
+    "witch": 20.0,
+    "seer": 20.0,
+    "hunter": 20.0,
+    "day_vote": 30.0,
+}
+
+# 断线玩家可以凭会话令牌重连回原座位的宽限时间（秒）
+RECONNECT_GRACE = 60.0
+
+
+class Phase:
+    def __init__(self, phase_id, name, timeout):
+        self.phase_id = phase_id
+        self.name = name
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def tag(self, message):
+        # 提示消息带上阶段编号，客户端回复时原样带回，用来丢弃超时后才到达的旧回复
+        message["phase"] = self.phase_id
+        return message
+
+    def accepts(self, response):
+        return response.get("phase", self.phase_id) == self.phase_id
+
+    def finish(self):
+        # 阶段结束时记录实际耗时（所有真人到齐或截止时间到）
+        metrics.registry.observe("werewolf_phase_seconds", time.monotonic() - self.started, phase=self.name)
+
+
+class PhaseScheduler:
+    """
+    为每个阶段生成带截止时间的 Phase：所有真人输入到齐或截止时间一到，阶段立即结束，
+    超时的玩家按默认行动处理
+    """
+    def __init__(self, deadlines=None):
+        self.deadlines = dict(PHASE_DEADLINES)
+        if deadlines:
+            self.deadlines.update(deadlines)
+        self.phase_ids = itertools.count(1)
+
+    def begin(self, name):
+        return Phase(next(self.phase_ids), name, self.deadlines[name])
@@ -0,0 +1,372 @@
+import random
+import time
+from bisect import bisect
+from itertools import accumulate, combinations
+from game import WerewolfGame, popcount
+from models import Player
+from events import DayEvent, NightEvent
+import metrics
+
+# 每次决策的默认时间预算（毫秒）
+DEFAULT_BUDGET_MS = 3.0
+# 推演对局的天数上限，防止异常局面无限循环
+MAX_DAYS = 50
+# 每次决策最多比较的候选数，超出的按信念排序截断
+MAX_OPTIONS = 4
+# 先验按多少局推演计入胜率估计：推演次数少时更多依赖信念本身
+PRIOR_WEIGHT = 2.0
+# 似然系数：狼人投票给同伴、夜间死亡者是狼人（被女巫毒死）相对于其他情况的可能性
+TEAMMATE_VOTE = 0.2
+# 警长选举正好相反：狼人把票投给同伴争夺警徽
+TEAMMATE_SHERIFF_VOTE = 5.0
+NIGHT_DEATH_WOLF = 0.1
+
+NIGHT = NightEvent("黑夜", "狼人行动")
+DAY = DayEvent("白天", "讨论和投票")
+
+
+def quiet(*args, **kwargs):
+    pass
+
+
+class BeliefState:
+    """
+    某个 AI 玩家对隐藏身份的信念：每种可能的狼人座位组合（位掩码）-> 权重。
+    公开事件到来时按似然增量更新；边缘概率和抽样表按版本号缓存，同一版本下的所有推演共用
+    """
+    __slots__ = ("owner", "weights", "version", "_cached", "_marginals", "_masks", "_cumulative")
+
+    def __init__(self, owner, num_players, wolf_count, wolf_mask=None):
+        self.owner = owner
+        if wolf_mask is not None:
+            # 狼人互相知道身份，信念只有真实的一种组合
+            self.weights = {wolf_mask: 1.0}
+        else:
+            others = [seat for seat in range(num_players) if seat != owner]
+            self.weights = {sum(1 << seat for seat in combo): 1.0 for combo in combinations(others, wolf_count)}
+        self.version = 0
+        self._cached = -1
+
+    def scale(self, matches, factor):
+        for mask in self.weights:
+            if matches(mask):
+                self.weights[mask] *= factor
+        self.version += 1
+
+    def keep(self, matches):
+        # 只保留与事实相符的组合；近似更新导致全部排除时保留原信念
+        weights = {mask: weight for mask, weight in self.weights.items() if matches(mask)}
+        if weights and len(weights) != len(self.weights):
+            self.weights = weights
+            self.version += 1
+
+    def observe_vote(self, voter, target, factor=TEAMMATE_VOTE):
+        # 投给自己不涉及另一个座位，不说明任何阵营关系
+        if voter == target:
+            return
+        pair = (1 << voter) | (1 << target)
+        self.scale(lambda mask: mask & pair == pair, factor)
+
+    def observe_night_death(self, seat):
+        bit = 1 << seat
+        self.scale(lambda mask: mask & bit, NIGHT_DEATH_WOLF)
+
+    def observe_check(self, seat, is_wolf):
+        bit = 1 << seat
+        self.keep(lambda mask: bool(mask & bit) == is_wolf)
+
+    def observe_ongoing(self, alive_mask):
+        # 对局仍在进行：存活狼人至少一名且少于存活好人
+        def ongoing(mask):
+            wolves = popcount(mask & alive_mask)
+            return 0 < wolves < popcount(alive_mask) - wolves
+        self.keep(ongoing)
+
+    def _refresh(self):
+        if self._cached == self.version:
+            return
+        self._masks = list(self.weights)
+        self._cumulative = list(accumulate(self.weights[mask] for mask in self._masks))
+        total = self._cumulative[-1]
+        marginals = {}
+        for mask, weight in self.weights.items():
+            seat = 0
+            while mask >> seat:
+                if mask >> seat & 1:
+                    marginals[seat] = marginals.get(seat, 0.0) + weight / total
+                seat += 1
+        self._marginals = marginals
+        self._cached = self.version
+
+    def wolf_probability(self, seat):
+        self._refresh()
+        return self._marginals.get(seat, 0.0)
+
+    def sample(self, rng):
+        self._refresh()
+        return self._masks[bisect(self._cumulative, rng.random() * self._cumulative[-1])]
+
+
+class SearchAI:
+    """
+    基于信念与蒙特卡洛推演的 AI：每个 AI 玩家维护一份对隐藏身份的信念，
+    决策时从信念中抽样完整的身份分配，对每个候选行动各推演一局随机对局，
+    在时间预算内比较各候选的胜率。挂在 game.ai 上后由 WerewolfGame.record 推送事件
+    """
+    def __init__(self, game, budget=DEFAULT_BUDGET_MS, seed=None, seats=None, iterations=None):
+        self.game = game
+        self.budget = budget / 1000
+        # 指定 iterations 时按固定轮数推演而不看时间，结果可复现
+        self.iterations = iterations
+        # 未指定种子时从对局种子派生，推演与决策同样可复现
+        self.rng = random.Random(f"{game.seed}/search" if seed is None else seed)
+        num_players = len(game.players)
+        # 角色构成是公开的，具体谁是什么角色是隐藏的
+        self.good_roles = [p.role for p in game.players if not p.is_wolf()]
+        self.beliefs = {}
+        for p in game.players:
+            if p.is_ai and (seats is None or p.seat in seats):
+                known = game.wolf_mask if p.is_wolf() else None
+                self.beliefs[p.seat] = BeliefState(p.seat, num_players, popcount(game.wolf_mask), known)
+        self.night = True
+        self.night_deaths = []
+        self.voted = set()
+        self.poisoned = None
+        self.antidote_used = False
+        self.poison_used = False
+
+    def observe(self, event):
+        """
+        接收对局事件，按公开信息（以及各玩家自己的私有信息）更新信念
+        """
+        kind = event[0]
+        if kind == "vote":
+            self.voted.add(event[1])
+            # 警长选出（或选举失败）之前的投票都是警长选举的投票
+            factor = TEAMMATE_VOTE if self.game.sheriff_elect else TEAMMATE_SHERIFF_VOTE
+            for belief in self.beliefs.values():
+                belief.observe_vote(event[1], event[2], factor)
+        elif kind == "alive":
+            if self.night and not event[2]:
+                self.night_deaths.append(event[1])
+        elif kind == "potion":
+            if event[2] == "antidote":
+                self.antidote_used = True
+            else:
+                self.poison_used = True
+        elif kind == "intent" and event[1] == "poison":
+            self.poisoned = (event[2], event[3])
+        elif kind == "check":
+            belief = self.beliefs.get(event[1])
+            if belief is not None:
+                belief.observe_check(event[2], bool(self.game.wolf_mask >> event[2] & 1))
+        elif kind == "day":
+            self.end_night()
+        elif kind == "reset_votes":
+            self.voted.clear()
+            if not self.night:
+                # 白天放逐结束，进入黑夜
+                self.night = True
+                for belief in self.beliefs.values():
+                    belief.observe_ongoing(self.game.alive_mask)
+
+    def end_night(self):
+        # 夜间死讯天亮后才公开；女巫知道自己毒死的是谁，不据此推断
+        for seat in self.night_deaths:
+            for belief in self.beliefs.values():
+                if self.poisoned != (belief.owner, seat):
+                    belief.observe_night_death(seat)
+        for belief in self.beliefs.values():
+            belief.observe_ongoing(self.game.alive_mask)
+        self.night_deaths.clear()
+        self.poisoned = None
+        self.night = False
+
+    def sheriff_vote(self, voter, candidates):
+        belief = self.beliefs.get(voter.seat)
+        if belief is None:
+            return self.game.ai_rng.choice(candidates)
+        # 信念里没有自己的座位（狼人概率为 0），不排除自己会永远投给自己
+        candidates = [p for p in candidates if p is not voter] or candidates
+        if voter.is_wolf():
+            teammates = [p for p in candidates if p.is_wolf()]
+            return self.rng.choice(teammates or candidates)
+        return self.least(candidates, lambda p: belief.wolf_probability(p.seat))
+
+    def day_vote(self, voter, candidates):
+        belief = self.beliefs.get(voter.seat)
+        if belief is None:
+            return self.game.ai_rng.choice(candidates)
+        if voter.is_wolf():
+            options = [p for p in candidates if not p.is_wolf()] or candidates
+            options = self.rng.sample(options, min(MAX_OPTIONS, len(options)))
+            priors = [0.5] * len(options)
+        else:
+            options = sorted(candidates, key=lambda p: -belief.wolf_probability(p.seat))[:MAX_OPTIONS]
+            priors = [belief.wolf_probability(p.seat) for p in options]
+        with metrics.registry.time("werewolf_ai_decision_seconds", decision="day_vote"):
+            return self.search(voter, options, priors, self.play_day_vote)
+
+    def night_action(self, player):
+        if player.seat not in self.beliefs:
+            return player.night_action(self.game.players, self.game.ai_rng)
+        if player.is_wolf():
+            with metrics.registry.time("werewolf_ai_decision_seconds", decision="werewolf"):
+                target = self.wolf_target(player)
+            return {"vote": target.name} if target else None
+        if player.is_witch():
+            with metrics.registry.time("werewolf_ai_decision_seconds", decision="witch"):
+                return self.witch_action(player)
+        if player.is_seer():
+            return self.seer_check(player)
+        return player.night_action(self.game.players, self.game.ai_rng)
+
+    def wolf_target(self, wolf):
+        candidates = self.game.alive_villagers()
+        if not candidates:
+            return None
+        options = self.rng.sample(candidates, min(MAX_OPTIONS, len(candidates)))
+        return self.search(wolf, options, [0.5] * len(options), self.play_wolf_kill)
+
+    def witch_action(self, witch):
+        belief = self.beliefs[witch.seat]
+        options, priors = [None], [0.5]
+        if witch.state.has_antidote:
+            # 解药只能救狼人今晚的目标
+            if self.game.night.kill is not None:
+                target = self.game.player_at(self.game.night.kill)
+                options.append(("save", target))
+                priors.append(1.0 - belief.wolf_probability(target.seat))
+        if witch.state.has_poison:
+            alive = [p for p in self.game.alive_players() if p != witch]
+            for target in sorted(alive, key=lambda p: -belief.wolf_probability(p.seat))[:2]:
+                options.append(("poison", target))
+                priors.append(belief.wolf_probability(target.seat))
+        choice = self.search(witch, options, priors, self.play_witch)
+        if choice is None:
+            return None
+        return {"action": choice[0], "target": choice[1].name}
+
+    def seer_check(self, seer):
+        # 查验的价值在于信息，随机推演体现不出来：选狼人概率最接近一半、尚未查验过的玩家
+        belief = self.beliefs[seer.seat]
+        others = self.game.alive_mask & ~(1 << seer.seat)
+        candidates = self.game.players_in(others & ~self.game.checked[seer.seat]) or self.game.players_in(others)
+        if not candidates:
+            return None
+        target = self.least(candidates, lambda p: abs(belief.wolf_probability(p.seat) - 0.5))
+        return {"action": "check", "target": target.name, "result": "狼人" if target.is_wolf() else "好人"}
+
+    def least(self, candidates, key):
+        best = min(key(p) for p in candidates)
+        return self.rng.choice([p for p in candidates if key(p) == best])
+
+    def search(self, owner, options, priors, play):
+        """
+        每轮从信念中抽样一种身份分配，对所有候选各推演一局（共用同一抽样，减小方差），
+        预算用完后按（胜局 + 先验）/（推演局数 + 先验权重）选出最优候选
+        """
+        if len(options) == 1:
+            return options[0]
+        belief = self.beliefs[owner.seat]
+        team = "wolves" if owner.is_wolf() else "villagers"
+        wins = [0] * len(options)
+        plays = 0
+        deadline = time.perf_counter() + self.budget
+        while (plays < self.iterations) if self.iterations is not None else (time.perf_counter() < deadline):
+            roles = self.determinize(owner, belief)
+            for i, option in enumerate(options):
+                game = self.fork(owner, roles)
+                play(game, owner.seat, option)
+                if game.winner == team:
+                    wins[i] += 1
+            plays += 1
+        scores = [(wins[i] + PRIOR_WEIGHT * priors[i]) / (plays + PRIOR_WEIGHT) for i in range(len(options))]
+        best = max(scores)
+        return self.rng.choice([option for option, score in zip(options, scores) if score == best])
+
+    def determinize(self, owner, belief):
+        """
+        从信念中抽样狼人组合，其余角色在身份未知的座位间随机分配；自己的角色已知
+        """
+        mask = belief.sample(self.rng)
+        pool = list(self.good_roles)
+        if not owner.is_wolf():
+            pool.remove(owner.role)
+        self.rng.shuffle(pool)
+        wolf_role = next(p.role for p in self.game.players if p.is_wolf())
+        roles = []
+        for seat in range(len(self.game.players)):
+            if mask >> seat & 1:
+                roles.append(wolf_role)
+            elif seat == owner.seat:
+                roles.append(owner.role)
+            else:
+                roles.append(pool.pop())
+        return roles
+
+    def fork(self, owner, roles):
+        """
+        按抽样的身份分配复制当前局面，推演对局不记日志、不输出，所有座位都由随机 AI 行动
+        """
+        # 推演对局直接共用搜索的随机流，省去每局初始化随机数生成器
+        game = WerewolfGame(streams=(self.rng, self.rng, self.rng))
+        game.log = quiet
+        for p in self.game.players:
+            game.add_player(Player(p.name, is_ai=True))
+        game.assign_roles(roles)
+        for p, copy in zip(self.game.players, game.players):
+            if not p.alive:
+                game.kill(copy)
+            copy.votes = p.votes
+            copy.sheriff = p.sheriff
+            if copy.is_witch():
+                if p is owner:
+                    copy.state.has_antidote = p.state.has_antidote
+                    copy.state.has_poison = p.state.has_poison
+                else:
+                    # 别人的药是否用过只能从公开事件推断：夜间结算时的用药记录
+                    copy.state.has_antidote = not self.antidote_used
+                    copy.state.has_poison = not self.poison_used
+        if self.game.sheriff:
+            game.sheriff = game.player_at(self.game.sheriff.seat)
+        game.sheriff_elect = self.game.sheriff_elect
+        game.day_count = self.game.day_count
+        game.night = self.game.night.copy()
+        return game
+
+    def play_wolf_kill(self, game, seat, target):
+        game.set_wolf_kill(game.player_at(target.seat))
+        NIGHT.execute(game, done=("werewolf",))
+        play_out(game, night_next=False)
+
+    def play_witch(self, game, seat, option):
+        if option is not None:
+            game.apply_night_result(game.player_at(seat), {"action": option[0], "target": option[1].name})
+        NIGHT.execute(game, done=("werewolf", "seer", "witch"))
+        play_out(game, night_next=False)
+
+    def play_day_vote(self, game, seat, target):
+        voter = game.player_at(seat)
+        game.cast_vote(voter, game.player_at(target.seat))
+        # 今天还没投票的玩家按随机 AI 补投
+        alive = game.alive_players()
+        for p in alive:
+            if p.seat != seat and p.seat not in self.voted:
+                game.cast_vote(p, game.ai_rng.choice([q for q in alive if q != p]))
+        game.vote()
+        play_out(game, night_next=True)
+
+
+def play_out(game, night_next):
+    """
+    从当前局面开始按 NightEvent/DayEvent 交替推演到对局结束
+    """
+    if game.check_game_end():
+        return
+    events = (NIGHT, DAY) if night_next else (DAY, NIGHT)
+    while game.day_count <= MAX_DAYS:
+        for event in events:
+            event.execute(game)
+            if game.check_game_end():
+                return
@@ -1,22 +1,82 @@
-import random
 import socket
 import json
+import secrets
+import selectors
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from game import WerewolfGame
 from models import Player
 from events import DayEvent, NightEvent
+from protocol import encode_message, make_codec, FrameDecoder
+from scheduler import PhaseScheduler, RECONNECT_GRACE
+from status import StatusTracker
+from eventlog import open_journal
+from spectators import SpectatorHub, GOD, PUBLIC
+import phases
+import metrics
+
+# 进程内所有对局共享的有界线程池，用于重连握手等短任务，避免每个请求单独建线程
+EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="werewolf")
+# 每个连接待发送字节的上限：长时间不读取的客户端超出后按断线处理，可凭令牌重连
+OUTBOX_LIMIT = 1024 * 1024
+# 对局结束后最多等待多久把剩余消息发完（秒）
+DRAIN_TIMEOUT = 2.0
+
+class PhaseWait:
+    """
+    一个阶段已发出的提示与已收到的回复，selectors 循环可以同时等待多个阶段
+    """
+    def __init__(self, phase, prompts):
+        self.phase = phase
+        self.responses = dict.fromkeys(prompts)
+        self.waiting = set(prompts)
+
+    def done(self):
+        return not self.waiting or self.phase.expired()
+
 
 class GameServer:
-    def __init__(self, host='localhost', port=5000):
+    def __init__(self, host='localhost', port=5000, deadlines=None, log_dir=None, metrics_port=None,
+                 reconnect_grace=RECONNECT_GRACE, seed=None, spectator_port=None, spectator_key=None):
         self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # 允许复用仍处于 TIME_WAIT 的端口，服务端重启（或压测连续启动）时不会绑定失败
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.server.bind((host, port))
         self.server.listen(2)  
-        self.game = WerewolfGame()
+        self.game = WerewolfGame(seed)
         self.players = []
         self.client_sockets = []
+        self.decoders = []
+        self.codecs = []
+        self.inboxes = []
+        # 开局后连接为非阻塞：发送先追加到 outboxes，写不完的部分由 selectors 循环在可写时写出
+        self.outboxes = []
+        self.send_lock = threading.Lock()
         self.vote_lock = threading.Lock()
-
+        self.scheduler = PhaseScheduler(deadlines)
+        self.status = None
+        # 会话令牌 -> 连接序号；断线时间与未回复的提示用于重连后恢复
+        self.tokens = {}
+        self.reconnect_grace = reconnect_grace
+        self.disconnected_at = []
+        self.pending_prompts = []
+        self.reconnected = threading.Condition()
+        # 重连线程换上新连接后写入 wakeup_writer，唤醒正在 select 的阶段分发
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        # 事件日志目录，为 None 时不写日志
+        self.log_dir = log_dir
+        # 指定端口时开启指标埋点，并在本地 HTTP 端口提供 Prometheus 格式输出
+        if metrics_port:
+            metrics.serve(metrics_port)
+            metrics.registry.gauge("werewolf_threads", threading.active_count)
+        # 指定观战端口时开启观战；持 spectator_key 或已出局玩家的会话令牌可以看上帝视角
+        self.spectator_key = spectator_key
+        self.spectators = None
+        if spectator_port:
+            self.spectators = SpectatorHub(host, spectator_port, self.spectator_view, self.spectator_snapshot)
+            self.game.spectators = self.spectators
 
     def start(self):
         print("等待玩家连接...")
@@ -29,17 +89,29 @@ class GameServer:
             client_socket, addr = self.server.accept()
             print(f"玩家{i + 1}已连接: {addr}")
             self.client_sockets.append(client_socket)
+            self.decoders.append(FrameDecoder())
+            self.codecs.append(make_codec("json"))
+            self.inboxes.append(deque())
+            self.outboxes.append(bytearray())
+            self.disconnected_at.append(None)
+            self.pending_prompts.append(None)
 
         self.players = []
         for i in range(num_real_players):
-            player_name = self.receive_message(i)["name"]
-            self.players.append(Player(player_name))
+            hello = self.receive_message(i)
+            self.negotiate_codec(i, hello.get("codec"))
+            self.players.append(Player(hello.get("name") or f"玩家{i + 1}"))
 
         self.broadcast_message({"type": "wait_confirm", "players": [player.name for player in self.players]})
 
-        confirmations = [self.receive_message(i)["confirm"] for i in range(num_real_players)]
+        # 确认前断线的玩家收到的是空消息，按未确认处理
+        confirmations = [self.receive_message(i).get("confirm") for i in range(num_real_players)]
 
         if all(confirmations):
+            for client_socket in self.client_sockets:
+                client_socket.setblocking(False)
+            if self.log_dir:
+                self.game.journal = open_journal(self.log_dir, self.game.seed)
             for player in self.players:
                 self.game.add_player(player)
 
@@ -49,7 +121,10 @@ class GameServer:
                     self.game.add_player(Player(names[i], is_ai=True))
 
             self.game.random_allocate()
+            self.send_roster()
+            self.status = StatusTracker(self.game)
             self.send_game_status()
+            threading.Thread(target=self.accept_reconnects, daemon=True).start()
 
             self.game.events = [
                 NightEvent("黑夜", "狼人行动"),
@@ -60,23 +135,151 @@ class GameServer:
         else:
             self.broadcast_message({"type": "game_cancelled"})
 
-    def broadcast_message(self, message):
-        for sc in self.client_sockets:
+    def negotiate_codec(self, player_index, requested):
+        # 握手回复固定用 JSON 发送，之后的消息改用协商出的编码
+        codec = make_codec(requested)
+        token = secrets.token_urlsafe(16)
+        self.tokens[token] = player_index
+        self.send_message({"type": "welcome", "codec": codec.name, "token": token}, player_index)
+        self.codecs[player_index] = codec
+        self.decoders[player_index].codec = codec
+
+    def accept_reconnects(self):
+        # 开局后继续监听，只接受持有会话令牌的重连
+        while True:
             try:
-                sc.send(json.dumps(message).encode())
-            except:
-                print("发送消息失败")
-                
+                client_socket, addr = self.server.accept()
+            except OSError:
+                return
+            print(f"收到重连请求: {addr}")
+            EXECUTOR.submit(self.resume_session, client_socket)
+
+    def can_resume(self, player_index):
+        disconnected_at = self.disconnected_at[player_index]
+        return disconnected_at is None or time.monotonic() - disconnected_at <= self.reconnect_grace
+
+    def resume_session(self, client_socket):
+        """
+        断线玩家重连：校验令牌后换上新连接，补发座位表、状态快照以及尚未回复的提示
+        """
+        decoder = FrameDecoder()
+        messages = []
+        try:
+            client_socket.settimeout(5)
+            while not messages:
+                data = client_socket.recv(4096)
+                if not data:
+                    client_socket.close()
+                    return
+                messages = decoder.feed(data)
+            client_socket.setblocking(False)
+        except (OSError, ValueError):
+            client_socket.close()
+            return
+        hello = messages[0]
+        player_index = self.tokens.get(hello.get("token"))
+        with self.reconnected:
+            if player_index is None or not self.can_resume(player_index):
+                try:
+                    client_socket.sendall(encode_message({"type": "reconnect_rejected"}))
+                finally:
+                    client_socket.close()
+                return
+            old_socket = self.client_sockets[player_index]
+            try:
+                # 旧连接可能是半开状态，关闭读写让阻塞在其上的接收线程立即返回
+                old_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            old_socket.close()
+            codec = make_codec(hello.get("codec"))
+            decoder.codec = codec
+            with self.send_lock:
+                # 旧连接上没发出去的消息作废，重连后补发座位表和快照
+                self.client_sockets[player_index] = client_socket
+                self.outboxes[player_index].clear()
+            self.decoders[player_index] = decoder
+            self.codecs[player_index] = codec
+            self.inboxes[player_index].clear()
+            self.inboxes[player_index].extend(messages[1:])
+            self.disconnected_at[player_index] = None
+            print(f"玩家{player_index + 1}已重连")
+
+            # welcome 固定用 JSON 编码，客户端收到后再切换编码
+            self.send_data(encode_message({"type": "welcome", "codec": codec.name, "token": hello["token"],
+                                           "resumed": True}), player_index)
+            names = [p.name for p in self.game.players]
+            self.send_message({"type": "roster", "players": names}, player_index)
+            codec.set_roster(names)
+            self.send_data(self.status.snapshot(self.players[player_index], codec), player_index)
+            pending = self.pending_prompts[player_index]
+            if pending and not pending[0].expired():
+                self.send_message(pending[1], player_index)
+            self.reconnected.notify_all()
+        self.wakeup_writer.send(b"\0")
+
+    def wait_reconnect(self, player_index, old_socket, phase):
+        """
+        连接断开后在宽限期内等待该座位重连，最多等到阶段截止；重连成功返回 True
+        """
+        with self.reconnected:
+            if self.client_sockets[player_index] is not old_socket:
+                return True
+            if self.disconnected_at[player_index] is None:
+                self.disconnected_at[player_index] = time.monotonic()
+                print(f"玩家{player_index + 1}连接断开，等待重连")
+            if phase is None:
+                return False
+            while self.client_sockets[player_index] is old_socket:
+                timeout = min(phase.remaining(),
+                              self.disconnected_at[player_index] + self.reconnect_grace - time.monotonic())
+                if timeout <= 0:
+                    return False
+                self.reconnected.wait(timeout)
+            return True
+
+    def spectator_view(self, hello):
+        if hello.get("view") == GOD:
+            if self.spectator_key and hello.get("key") == self.spectator_key:
+                return GOD
+            player_index = self.tokens.get(hello.get("token"))
+            if player_index is not None and not self.players[player_index].alive:
+                return GOD
+        return PUBLIC
+
+    def spectator_snapshot(self, view, codec):
+        if self.status is None:
+            return None
+        return self.status.spectator_snapshot(self.game.all_mask if view == GOD else 0, codec)
+
+    def send_roster(self):
+        # 座位表下发后，二进制编码中的玩家名改用座位号表示
+        names = [p.name for p in self.game.players]
+        self.broadcast_message({"type": "roster", "players": names})
+        for codec in self.codecs:
+            codec.set_roster(names)
+
+    def broadcast_message(self, message):
+        # 每种编码只序列化一次，同一编码的连接发送相同的字节；观众的副本只入队，由观战线程发送
+        if self.spectators:
+            self.spectators.publish(message)
+        encoded = {}
+        for player_index, codec in enumerate(self.codecs):
+            if codec.name not in encoded:
+                with metrics.registry.time("werewolf_encode_seconds", codec=codec.name):
+                    encoded[codec.name] = encode_message(message, codec)
+            self.send_data(encoded[codec.name], player_index)
+
     def send_game_status(self):
         for i, player in enumerate(self.players):
-            status = {
-                "type": "game_status",
-                "role": player.role.name,
-                "players": [(p.name, p.role.name if p == player or p.is_wolf() and player.is_wolf() else "未知", 
-                            p.alive, p.sheriff) for p in self.game.players],
-                "day_count": self.game.day_count
-            }
-            self.send_message(status, i)
+            self.send_data(self.status.snapshot(player, self.codecs[i]), i)
+        if self.spectators:
+            self.spectators.resync()
+
+    def send_status_update(self):
+        delta = self.status.delta()
+        if delta:
+            self.broadcast_message(delta)
             
     def run_game(self):
         print("=== 狼人杀游戏开始 ===")
@@ -84,7 +287,7 @@ class GameServer:
         while True:
             for event in self.game.events:
                 if isinstance(event, NightEvent):
-                    self.handle_night_phase()
+                    self.handle_night_phase(event)
                 if not self.game.sheriff and not self.game.sheriff_elect:
                     self.handle_sheriff_election()
                     self.game.sheriff_elect = True
@@ -92,280 +295,338 @@ class GameServer:
                     self.game.transfer_sheriff()
                 elif isinstance(event, DayEvent):
                     self.handle_day_phase()
-                
-                time.sleep(1)
-                self.send_game_status()
-                    
+
+                self.send_status_update()
+
                 if self.game.check_game_end():
+                    if self.game.journal:
+                        self.game.journal.close()
                     self.broadcast_message({"type": "game_end"})
+                    self.drain_outboxes()
+                    if self.spectators:
+                        self.spectators.drain()
                     return
+                if self.game.journal:
+                    # 每个阶段结束时日志落盘，必要时写快照
+                    self.game.journal.checkpoint(self.game)
 
     def handle_sheriff_election(self):
-        vote_threads = []
-
-        for i, player in enumerate(self.players):
-            if player.alive:
-                thread = threading.Thread(
-                    target=self.player_sheriff_vote,
-                    args=(i, player)
-                )
-                vote_threads.append(thread)
-                thread.start()
-
-        valid_candidates = [p for p in self.game.players if p.alive and p not in self.players]
-        for voter in valid_candidates:
-            with self.vote_lock:
-                target = random.choice(valid_candidates)
-                target.votes += 1
-                print(f"{voter.name, voter.role.name} 投票给 {target.name}")
-
-        for thread in vote_threads:
-            thread.join()
-
+        phase = self.scheduler.begin("sheriff_election")
+        prompts = {i: phases.sheriff_prompt(self.game) for i, player in enumerate(self.players) if player.alive}
+        with self.vote_lock:
+            self.game.ai_sheriff_votes(self.players)
+        self.run_phase(phase, prompts, lambda player, response: phases.apply_sheriff_vote(self.game, player, response))
         self.game.elect_sheriff()
 
-    def player_sheriff_vote(self, player_index, player):
-        self.send_message({
-            "type": "sheriff_election",
-            "candidates": [p.name for p in self.game.players if p.alive]
-        }, player_index)
-        
-        response = self.receive_message(player_index)
-        target_name = response["vote"]
-        
+    def send_prompt(self, message, player_index, phase):
+        # 记录未回复的提示，玩家重连后补发
+        self.pending_prompts[player_index] = (phase, phase.tag(message))
+        self.send_message(message, player_index)
+
+    def handle_night_phase(self, event):
+        """
+        按 NightEvent 声明的依赖推进夜间子阶段：依赖都已完成的子阶段立即执行 AI 行动并发出提示，
+        进行中的子阶段在同一个 selectors 循环里收回复；某个子阶段收齐或截止后立即结算，
+        依赖它的子阶段随即开始，互不依赖的子阶段（狼人与预言家）同时进行。
+        写入意图的子阶段全部完成后一次结算生死，再进行结算之后的子阶段（猎人开枪）
+        """
+        with self.vote_lock:
+            self.game.begin_night()
+        self.run_stages(event.stages)
+        with self.vote_lock:
+            event.settle(self.game)
+        self.run_stages(event.after)
+
+    def run_stages(self, stages):
+        pending = list(stages)
+        finished = set()
+        running = {}
+        while pending or running:
+            for stage in [stage for stage in pending if finished.issuperset(stage.requires)]:
+                pending.remove(stage)
+                running[stage] = self.begin_stage(stage)
+            self.wait_any(running.values())
+            for stage, wait in list(running.items()):
+                if wait.done():
+                    del running[stage]
+                    self.apply_responses(wait, lambda player, response, role_type=stage.name:
+                                         phases.apply_night_response(self.game, player, role_type, response))
+                    with self.vote_lock:
+                        stage.end(self.game)
+                    finished.add(stage.name)
+
+    def begin_stage(self, stage):
         with self.vote_lock:
-            target = next((p for p in self.game.players if p.name == target_name), None)
-            if target:
-                target.votes += 1
-    def player_day_vote(self, player_index, player):
-        data = {
-            "type": "day_vote",
-            "candidates": [p.name for p in self.game.players if p.alive and p != player]
+            stage.begin(self.game)
+        phase = self.scheduler.begin(stage.name)
+        prompts = {
+            i: phases.night_prompt(self.game, player, stage.name)
+            for i, player in enumerate(self.players) if stage.selects(self.game, player)
         }
-        self.send_message(data, player_index)
-        
-        response = self.receive_message(player_index)
-        if response and "vote" in response:
-            target_name = response["vote"]
-            
-            with self.vote_lock:
-                target = next((p for p in self.game.players if p.name == target_name), None)
-                if target:
-                    target.votes += 1.5 if player.sheriff else 1
-                    print(f"{player.name} ({player.role.name}) 投票给 {target.name}")
-    def handle_night_phase(self):
-        night_lock = threading.Lock()
-        # 阶段1: 狼人行动（所有狼人优先行动）
-        def process_wolves():
-            wolf_threads = []
-            for i, player in enumerate(self.game.players):
-                if player.alive and player.is_wolf() and not player.is_ai:
-                    thread = threading.Thread(
-                        target=self.player_night_action,
-                        args=(i, player, "werewolf")
-                    )
-                    wolf_threads.append(thread)
-                    thread.start()
-            for thread in wolf_threads:
-                thread.join()
-
-        # 阶段2: 女巫行动（狼人行动完成后执行）
-        def process_witches():
-            witch_threads = []
-            for player in self.game.players:
-                if player.alive and player.is_witch() and player.is_ai:
-                    action_result = player.night_action(self.game.players)
-                    if action_result:
-                        with night_lock:
-                            print(f"女巫 {player.name} (AI) 执行行动: {action_result}")
-            for i, player in enumerate(self.game.players):
-                if player.alive and player.is_witch() and not player.is_ai:
-                    thread = threading.Thread(
-                        target=self.player_night_action,
-                        args=(i, player, "witch")
-                    )
-                    witch_threads.append(thread)
-                    thread.start()
-            for thread in witch_threads:
-                thread.join()
-
-        # 阶段3: 预言家行动（女巫行动完成后执行）
-        def process_seers():
-            seer_threads = []
-            for player in self.game.players:
-                if player.alive and player.is_seer() and player.is_ai:
-                    action_result = player.night_action(self.game.players)
-                    if action_result:
-                        with night_lock:
-                            print(f"预言家 {player.name} (AI) 执行行动: {action_result}")
-            for i, player in enumerate(self.game.players):
-                if player.alive and player.is_seer() and not player.is_ai:
-                    thread = threading.Thread(
-                        target=self.player_night_action,
-                        args=(i, player, "seer")
-                    )
-                    seer_threads.append(thread)
-                    thread.start()
-            for thread in seer_threads:
-                thread.join()
-
-        def process_hunters():
-            hunter_threads = []
-            for player in self.game.players:
-                if not player.alive and player.is_hunter() and player.is_ai:
-                    action_result = player.night_action(self.game.players)
-                    if action_result:
-                        with night_lock:
-                            print(f"猎人 {player.name} (AI) 执行行动: {action_result}")
-            for i, player in enumerate(self.game.players):
-                if not player.alive and player.is_hunter() and not player.is_ai:
-                    thread = threading.Thread(
-                        target=self.player_night_action,
-                        args=(i, player, "hunter")
-                    )
-                    hunter_threads.append(thread)
-                    thread.start()
-            for thread in hunter_threads:
-                thread.join()
-
-        process_wolves()      
-        process_witches()     
-        process_seers()       
-        # process_hunters()     
-
-        self.game.night_actions()
+        return self.send_prompts(phase, prompts)
 
     def handle_day_phase(self):
         self.game.day_actions()
-
-        vote_threads = []
-
-        for i, player in enumerate(self.players):
-            if player.alive:
-                thread = threading.Thread(
-                    target=self.player_day_vote,
-                    args=(i, player)
-                )
-                vote_threads.append(thread)
-                thread.start()
-
-        valid_candidates = [p for p in self.game.players if p.alive]
-        for voter in valid_candidates:
-            if voter.is_ai:  
-                vote_candidates = [p for p in self.game.players if p.alive and p != voter]
-                with self.vote_lock:
-                    if vote_candidates:
-                        target = random.choice(vote_candidates)
-                        target.votes += 1
-                        print(f"{voter.name} ({voter.role.name}) 投票给 {target.name}")
-                    else:
-                        print(f"{voter.name} 没有可投票的目标")
-
-        for thread in vote_threads:
-            thread.join()
-
+        phase = self.scheduler.begin("day_vote")
+        prompts = {i: phases.day_vote_prompt(self.game, player) for i, player in enumerate(self.players) if player.alive}
+        with self.vote_lock:
+            self.game.ai_day_votes()
+        self.run_phase(phase, prompts, lambda player, response: phases.apply_day_vote(self.game, player, response))
         self.game.vote()
 
-    def player_night_action(self, player_index, player, role_type):
+    def run_phase(self, phase, prompts, apply):
+        """
+        发出阶段内的全部提示并收齐回复，然后在同一把锁内依次应用；
+        apply 返回需要私下回传给该玩家的消息（如查验结果）
+        """
+        wait = self.send_prompts(phase, prompts)
+        while not wait.done():
+            self.wait_any([wait])
+        self.apply_responses(wait, apply)
+
+    def apply_responses(self, wait, apply):
+        phase = wait.phase
+        for player_index in wait.responses:
+            self.pending_prompts[player_index] = None
+        with self.vote_lock:
+            for player_index, response in wait.responses.items():
+                player = self.players[player_index]
+                if not response:
+                    metrics.registry.inc("werewolf_response_timeouts_total", phase=phase.name)
+                    print(f"玩家 {player.name} 未在时限内行动，按默认行动处理")
+                    response = phases.default_response(self.game, player, phase.name)
+                try:
+                    reply = apply(player, response)
+                except Exception as e:
+                    print(f"处理玩家 {player.name} 的回复时发生错误: {str(e)}")
+                    continue
+                if reply:
+                    self.send_message(reply, player_index)
+        phase.finish()
+
+    def send_prompts(self, phase, prompts):
+        for player_index, message in prompts.items():
+            self.send_prompt(message, player_index, phase)
+        return PhaseWait(phase, prompts)
+
+    def wait_any(self, waits):
+        """
+        在当前线程里用 selectors 同时等待所有进行中阶段的连接可读，
+        直到至少一个阶段收齐回复或截止；超时或断线的玩家回复留空。
+        同一个循环也把各连接发送缓冲中剩余的字节在可写时写出
+        """
+        waits = list(waits)
+        selector = selectors.DefaultSelector()
+        selector.register(self.wakeup_reader, selectors.EVENT_READ, None)
+        registered = {}
         try:
-            if role_type == "werewolf":
-                candidates = [p.name for p in self.game.players if p.alive and not p.is_wolf()]
-                self.send_message({
-                    "type": "night_action",
-                    "action": "werewolf",
-                    "candidates": candidates
-                }, player_index)
-                
-                response = self.receive_message(player_index)
-                if response and "target" in response:
-                    with self.vote_lock:
-                        target_name = response["target"]
-                        self.game.human_wolf_votes[target_name] += 1
-                        print(f"狼人 {player.name} (真人) 选择击杀 {target_name}")
-
-            elif role_type == "witch":
-                dead_players = [p.name for p in self.game.players if not p.alive]
-                alive_players = [p.name for p in self.game.players if p.alive and p != player]
-                self.send_message({
-                    "type": "night_action",
-                    "action": "witch",
-                    "has_poison": player.role.has_poison,
-                    "has_antidote": player.role.has_antidote,
-                    "dead_players": dead_players,
-                    "alive_players": alive_players
-                }, player_index)
-                
-                response = self.receive_message(player_index)
-                if response:
-                    if "save" in response and player.role.has_antidote:
-                        target_name = response["save"]
-                        target = next((p for p in self.game.players if p.name == target_name), None)
-                        if target and not target.alive:
-                            target.alive = True
-                            player.role.has_antidote = False
-                            print(f"女巫 {player.name} (真人) 使用解药救活 {target_name}")
-                    if "poison" in response and player.role.has_poison:
-                        target_name = response["poison"]
-                        target = next((p for p in self.game.players if p.name == target_name), None)
-                        if target and target.alive:
-                            target.alive = False
-                            player.role.has_poison = False
-                            print(f"女巫 {player.name} (真人) 使用毒药击杀 {target_name}")
-            elif role_type == "seer":
-                candidates = [p.name for p in self.game.players if p.alive and p != player]
-                self.send_message({
-                    "type": "night_action",
-                    "action": "seer",
-                    "candidates": candidates
-                }, player_index)
-                
-                response = self.receive_message(player_index)
-                if response and "target" in response:
-                    target_name = response["target"]
-                    target = next((p for p in self.game.players if p.name == target_name), None)
-                    if target:
-                        role = "狼人" if target.is_wolf() else "好人"
-                        self.send_message({
-                        "type": "seer_result",
-                        "action": "seer",
-                        "target": target_name,
-                        "result": role,
-                        }, player_index)
-
-            elif role_type == "hunter":
-                candidates = [p.name for p in self.game.players if p.alive and p != player]
-                self.send_message({
-                    "type": "night_action",
-                    "action": "hunter",
-                    "candidates": candidates
-                }, player_index)
-                
-                response = self.receive_message(player_index)
-                if response and "target" in response:
-                    target_name = response["target"]
-                    target = next((p for p in self.game.players if p.name == target_name), None)
-                    if target:
-                        target.alive = False
-                        print(f"猎人 {player.name} (真人) 带走了 {target_name}")
-        except Exception as e:
-            print(f"处理玩家 {player.name} 夜间行动时发生错误: {str(e)}")
-        
-    def send_message(self, message, player_index):
+            while True:
+                for wait in waits:
+                    self.collect(wait)
+                if any(wait.done() for wait in waits):
+                    return
+
+                # 重连会替换连接，每轮按当前连接更新注册；断线中的连接不再监听
+                timeout = min(wait.phase.remaining() for wait in waits)
+                waiting = set()
+                for wait in waits:
+                    for player_index in wait.waiting:
+                        disconnected_at = self.disconnected_at[player_index]
+                        if disconnected_at is None:
+                            waiting.add(player_index)
+                        else:
+                            timeout = min(timeout, disconnected_at + self.reconnect_grace - time.monotonic())
+                self.update_selector(selector, registered, waiting)
+
+                for key, mask in selector.select(max(timeout, 0.001)):
+                    if key.data is None:
+                        self.wakeup_reader.recv(4096)
+                        continue
+                    if mask & selectors.EVENT_WRITE:
+                        with self.send_lock:
+                            if self.client_sockets[key.data] is key.fileobj:
+                                self.flush(key.data)
+                    if mask & selectors.EVENT_READ:
+                        self.read_ready(key.data, key.fileobj)
+        finally:
+            selector.close()
+
+    def update_selector(self, selector, registered, waiting):
+        # 等待回复的连接监听可读，发送缓冲非空的连接监听可写
+        for player_index, client_socket in enumerate(self.client_sockets):
+            events = 0
+            if self.disconnected_at[player_index] is None:
+                if player_index in waiting:
+                    events |= selectors.EVENT_READ
+                if self.outboxes[player_index]:
+                    events |= selectors.EVENT_WRITE
+            current = registered.get(player_index)
+            if current == (client_socket, events):
+                continue
+            if current:
+                selector.unregister(current[0])
+                del registered[player_index]
+            if events:
+                selector.register(client_socket, events, player_index)
+                registered[player_index] = (client_socket, events)
+
+    def drain_outboxes(self, timeout=DRAIN_TIMEOUT):
+        """
+        对局结束时调用：最多等待 timeout 秒，把各连接发送缓冲中剩余的消息写完
+        """
+        deadline = time.monotonic() + timeout
+        selector = selectors.DefaultSelector()
+        registered = {}
         try:
-            self.client_sockets[player_index].send(json.dumps(message).encode())
-        except:
-            print("发送消息失败")
-        
-    def receive_message(self, player_index):
+            while any(self.outboxes) and time.monotonic() < deadline:
+                self.update_selector(selector, registered, ())
+                if not registered:
+                    return
+                for key, _ in selector.select(max(deadline - time.monotonic(), 0.001)):
+                    with self.send_lock:
+                        self.flush(key.data)
+        finally:
+            selector.close()
+
+    def collect(self, wait):
+        for player_index in list(wait.waiting):
+            response = self.next_response(player_index, wait.phase)
+            if response:
+                wait.responses[player_index] = response
+                wait.waiting.discard(player_index)
+                metrics.registry.observe("werewolf_response_seconds", time.monotonic() - wait.phase.started,
+                                         phase=wait.phase.name)
+            elif self.disconnected_at[player_index] is not None and not self.can_resume(player_index):
+                wait.waiting.discard(player_index)
+
+    def read_ready(self, player_index, client_socket):
+        try:
+            data = client_socket.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if data:
+            metrics.registry.inc("werewolf_received_bytes_total", len(data))
+            decoder = self.decoders[player_index]
+            try:
+                with metrics.registry.time("werewolf_decode_seconds", codec=decoder.codec.name):
+                    self.inboxes[player_index].extend(decoder.feed(data))
+                return
+            except ValueError as e:
+                print(f"接收消息失败: {e}")
+        with self.reconnected:
+            if self.client_sockets[player_index] is client_socket and self.disconnected_at[player_index] is None:
+                self.disconnected_at[player_index] = time.monotonic()
+                print(f"玩家{player_index + 1}连接断开，等待重连")
+
+    def next_response(self, player_index, phase):
+        # 从已收到的消息中取出属于当前阶段的回复，顺带处理重新同步请求并丢弃过期回复
+        inbox = self.inboxes[player_index]
+        while inbox:
+            message = inbox.popleft()
+            if message.get("type") == "resync":
+                self.send_data(self.status.snapshot(self.players[player_index], self.codecs[player_index]), player_index)
+            elif phase.accepts(message):
+                return message
+            else:
+                print(f"丢弃玩家{player_index + 1}的过期回复: {message}")
+        return None
+
+    def send_message(self, message, player_index):
+        codec = self.codecs[player_index]
+        with metrics.registry.time("werewolf_encode_seconds", codec=codec.name):
+            data = encode_message(message, codec)
+        self.send_data(data, player_index)
+
+    def send_data(self, data, player_index):
+        """
+        追加到该连接的发送缓冲并立即尽量写出；开局后连接是非阻塞的，写不完的部分留给 selectors 循环，
+        不读取消息的客户端不会卡住整桌
+        """
+        with self.send_lock:
+            outbox = self.outboxes[player_index]
+            outbox += data
+            if len(outbox) > OUTBOX_LIMIT:
+                print(f"玩家{player_index + 1}长时间未接收消息，按断线处理")
+                outbox.clear()
+                try:
+                    # 关闭读写后读取一方收到连接结束，走断线重连的流程
+                    self.client_sockets[player_index].shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                return
+            self.flush(player_index)
+
+    def flush(self, player_index):
+        # 调用方持有 send_lock
+        outbox = self.outboxes[player_index]
+        client_socket = self.client_sockets[player_index]
+        while outbox:
+            try:
+                sent = client_socket.send(outbox)
+            except BlockingIOError:
+                return
+            except OSError:
+                # 连接已断开，由读取一方处理断线
+                print("发送消息失败")
+                outbox.clear()
+                return
+            metrics.registry.inc("werewolf_sent_bytes_total", sent)
+            del outbox[:sent]
+
+    def receive_message(self, player_index, phase=None):
+        """
+        读取下一条消息；传入 phase 时最多等到该阶段截止，超时返回 None，
+        并丢弃属于之前阶段的迟到回复
+        """
+        inbox = self.inboxes[player_index]
+        client_socket = None
         try:
-            return json.loads(self.client_sockets[player_index].recv(1024).decode())
+            while True:
+                while not inbox:
+                    # 重连后连接会被替换，每次读取前重新取当前连接
+                    client_socket = self.client_sockets[player_index]
+                    if phase:
+                        if phase.expired():
+                            return None
+                        client_socket.settimeout(max(phase.remaining(), 0.001))
+                    try:
+                        data = client_socket.recv(4096)
+                    except socket.timeout:
+                        raise
+                    except OSError:
+                        data = b""
+                    if not data:
+                        if self.wait_reconnect(player_index, client_socket, phase):
+                            continue
+                        return {}
+                    metrics.registry.inc("werewolf_received_bytes_total", len(data))
+                    decoder = self.decoders[player_index]
+                    with metrics.registry.time("werewolf_decode_seconds", codec=decoder.codec.name):
+                        inbox.extend(decoder.feed(data))
+                message = inbox.popleft()
+                if message.get("type") == "resync":
+                    self.send_data(self.status.snapshot(self.players[player_index], self.codecs[player_index]), player_index)
+                    continue
+                if phase is None or phase.accepts(message):
+                    return message
+                print(f"丢弃玩家{player_index + 1}的过期回复: {message}")
+        except socket.timeout:
+            return None
         except json.JSONDecodeError:
             print("接收消息失败: JSON解码错误")
             return {}
         except Exception as e:
             print(f"接收消息失败: {e}")
             return {}
-        
+        finally:
+            if phase and client_socket:
+                try:
+                    client_socket.settimeout(None)
+                except OSError:
+                    pass
+
 if __name__ == "__main__":
     server = GameServer()
     server.start()
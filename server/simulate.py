@@ -0,0 +1,134 @@
+import argparse
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from game import WerewolfGame
+from models import Player
+from events import DayEvent, NightEvent
+from search_ai import SearchAI
+
+# 防止异常局面无限循环
+MAX_DAYS = 50
+
+
+def quiet(*args, **kwargs):
+    pass
+
+
+def play_match(num_players, ai_budget=None, search_side="all", seed=None):
+    """
+    跑一局纯 AI 对局：不走网络、不输出、不等待，直接驱动 NightEvent/DayEvent。
+    指定 ai_budget（毫秒）时 search_side 一方使用搜索 AI，其余座位仍是随机 AI；
+    同一 seed 的随机 AI 对局逐步相同
+    """
+    game = WerewolfGame(seed)
+    game.log = quiet
+    for i in range(num_players):
+        game.add_player(Player(f"AI{i + 1}", is_ai=True))
+    game.random_allocate()
+    if ai_budget:
+        seats = None
+        if search_side != "all":
+            seats = {p.seat for p in game.players if p.is_wolf() == (search_side == "wolves")}
+        game.ai = SearchAI(game, ai_budget, seats=seats)
+    game.events = [
+        NightEvent("黑夜", "狼人行动"),
+        DayEvent("白天", "讨论和投票"),
+    ]
+
+    while game.day_count <= MAX_DAYS:
+        for event in game.events:
+            event.execute(game)
+            if game.check_game_end():
+                return game
+    return game
+
+
+class SimulationStats:
+    def __init__(self):
+        self.games = 0
+        self.wins = Counter()
+        self.lengths = Counter()
+        self.role_games = Counter()
+        self.role_survivors = Counter()
+
+    def record(self, game):
+        self.games += 1
+        self.wins[game.winner or "unfinished"] += 1
+        self.lengths[game.day_count] += 1
+        for player in game.players:
+            self.role_games[player.role.name] += 1
+            if player.alive:
+                self.role_survivors[player.role.name] += 1
+
+    def merge(self, other):
+        self.games += other.games
+        self.wins.update(other.wins)
+        self.lengths.update(other.lengths)
+        self.role_games.update(other.role_games)
+        self.role_survivors.update(other.role_survivors)
+        return self
+
+    def as_dict(self):
+        games = max(self.games, 1)
+        return {
+            "games": self.games,
+            "win_rate": {side: count / games for side, count in self.wins.items()},
+            "mean_length": sum(day * count for day, count in self.lengths.items()) / games,
+            "length_histogram": dict(sorted(self.lengths.items())),
+            "role_survival": {role: self.role_survivors[role] / count for role, count in self.role_games.items()},
+        }
+
+
+def run_batch(num_games, num_players, seed, ai_budget=None, search_side="all"):
+    # 批次种子依次派生出每局的种子
+    seeds = random.Random(seed)
+    stats = SimulationStats()
+    for _ in range(num_games):
+        stats.record(play_match(num_players, ai_budget, search_side, seeds.getrandbits(64)))
+    return stats
+
+
+def simulate(num_games, num_players=8, workers=None, batch_size=1000, seed=None, ai_budget=None,
+             search_side="all"):
+    """
+    把对局切成批次分发到进程池，每个批次用独立的种子，最后合并统计结果
+    """
+    base_seed = random.randrange(1 << 32) if seed is None else seed
+    batches = [min(batch_size, num_games - start) for start in range(0, num_games, batch_size)]
+    stats = SimulationStats()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_batch, size, num_players, base_seed + i, ai_budget, search_side) for i, size in enumerate(batches)]
+        for future in futures:
+            stats.merge(future.result())
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="狼人杀无头批量模拟")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--ai-budget", type=float, default=None, help="搜索 AI 每次决策的时间预算（毫秒），不指定时全部使用随机 AI")
+    parser.add_argument("--search-side", choices=["all", "villagers", "wolves"], default="all",
+                        help="使用搜索 AI 的一方")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stats = simulate(args.games, args.players, args.workers, args.batch_size, args.seed, args.ai_budget,
+                     args.search_side)
+    elapsed = time.perf_counter() - started
+
+    result = stats.as_dict()
+    print(f"对局数: {result['games']}  耗时: {elapsed:.2f}s  ({result['games'] / elapsed:.0f} 局/秒)")
+    print("胜率:", {side: f"{rate:.3f}" for side, rate in result["win_rate"].items()})
+    print(f"平均天数: {result['mean_length']:.2f}")
+    print("角色存活率:", {role: f"{rate:.3f}" for role, rate in result["role_survival"].items()})
+
+
+if __name__ == "__main__":
+    main()
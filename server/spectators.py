@@ -0,0 +1,298 @@
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+from protocol import encode_message, make_codec, FrameDecoder
+import metrics
+
+# 每名观众待发送队列的上限（字节），超出即视为跟不上直播
+QUEUE_BYTES = 256 * 1024
+# LAG_WINDOW 秒内跟不上超过 MAX_LAGS 次的观众会被断开
+MAX_LAGS = 3
+LAG_WINDOW = 60.0
+
+GOD, PUBLIC = "god", "public"
+ALL_VIEWS = (GOD, PUBLIC)
+
+# 公开视角能看到的对局事件；角色分配、狼人投票、查验、夜间意图和用药只在上帝视角下发
+PUBLIC_EVENTS = frozenset(("join", "vote", "sheriff", "alive", "night", "day", "winner"))
+
+
+class Subscriber:
+    __slots__ = ("sock", "decoder", "view", "codec", "queue", "queued", "sending", "stale", "lags",
+                 "dropped", "events")
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.decoder = FrameDecoder()
+        # 握手完成前 view 为 None
+        self.view = None
+        self.codec = None
+        # 待发送的完整帧；queued 为其总字节数。sending 是已从队列取出、尚未写完的部分，只由发送线程访问
+        self.queue = deque()
+        self.queued = 0
+        self.sending = b""
+        # 积压被丢弃后置位，下次发送前先补发座位表和最新的状态快照
+        self.stale = False
+        self.lags = deque()
+        self.dropped = False
+        self.events = selectors.EVENT_READ
+
+
+class SpectatorHub:
+    """
+    观战分发：观众连接单独的端口，按上帝视角或公开视角订阅对局。
+    游戏线程发布消息时每种编码只序列化一次，追加到各观众的有界队列后立即返回，不做网络写入；
+    单独的发送线程用 selectors 非阻塞地写出。队列满的观众丢弃积压、改为补发一份快照，
+    短时间内屡次跟不上的观众直接断开，慢观众不会拖慢对局和其他观众
+    """
+    def __init__(self, host, port, authorize, snapshot, queue_bytes=QUEUE_BYTES, max_lags=MAX_LAGS):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind((host, port))
+        self.server.listen(64)
+        self.server.setblocking(False)
+        # authorize(hello) 返回该观众的视角；snapshot(view, codec) 返回编码好的状态快照，开局前为 None
+        self.authorize = authorize
+        self.snapshot = snapshot
+        self.queue_bytes = queue_bytes
+        self.max_lags = max_lags
+        self.lock = threading.RLock()
+        self.subscribers = set()
+        # 队列由空变为非空或被判定断开的观众，由发送线程处理
+        self.dirty = set()
+        # 编码名 -> 共享的编码器：座位表对所有观众相同，同一编码的观众收到相同的字节
+        self.codecs = {}
+        self.roster = None
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.wakeup_reader.setblocking(False)
+        self.wakeup_writer.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server, selectors.EVENT_READ, "accept")
+        self.selector.register(self.wakeup_reader, selectors.EVENT_READ, "wakeup")
+        metrics.registry.gauge("werewolf_spectators", lambda: len(self.subscribers))
+        threading.Thread(target=self.run, daemon=True).start()
+        print(f"观战端口: {host}:{port}")
+
+    def publish(self, message, views=ALL_VIEWS):
+        """
+        游戏线程调用：消息放进对应视角观众的发送队列即返回
+        """
+        encoded = {}
+        wake = False
+        with self.lock:
+            for sub in self.subscribers:
+                if sub.view not in views or sub.dropped:
+                    continue
+                data = encoded.get(sub.codec.name)
+                if data is None:
+                    data = encoded[sub.codec.name] = encode_message(message, sub.codec)
+                wake |= self.enqueue(sub, data)
+            if message.get("type") == "roster":
+                # 座位表本身按旧座位表编码，之后的消息才用座位号代替玩家名
+                self.roster = list(message["players"])
+                for codec in self.codecs.values():
+                    codec.set_roster(self.roster)
+        if wake:
+            self.wake()
+
+    def publish_event(self, event):
+        if self.subscribers:
+            self.publish({"type": "game_event", "event": list(event)},
+                         ALL_VIEWS if event[0] in PUBLIC_EVENTS else (GOD,))
+
+    def resync(self):
+        # 开局后状态快照才可用：给所有观众补一份完整快照
+        wake = False
+        with self.lock:
+            for sub in self.subscribers:
+                if not sub.dropped:
+                    wake |= self.enqueue(sub, self.catch_up(sub))
+        if wake:
+            self.wake()
+
+    def catch_up(self, sub):
+        """
+        座位表加当前状态快照：观众据此从任意位置接上直播。座位表用尚未设置座位表的编码器编码
+        """
+        data = b""
+        if self.roster:
+            data = encode_message({"type": "roster", "players": self.roster}, make_codec(sub.codec.name))
+        return data + (self.snapshot(sub.view, sub.codec) or b"")
+
+    def drain(self, timeout=2.0):
+        """
+        对局结束时调用：最多等待 timeout 秒，让跟得上的观众收完剩余消息
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if not any(sub.queue or sub.sending or sub.stale for sub in self.subscribers):
+                    return
+            time.sleep(0.05)
+
+    def enqueue(self, sub, data):
+        # 调用方持有 self.lock；返回是否需要唤醒发送线程
+        if not data:
+            return False
+        if sub.queued + len(data) > self.queue_bytes:
+            now = time.monotonic()
+            while sub.lags and now - sub.lags[0] > LAG_WINDOW:
+                sub.lags.popleft()
+            sub.lags.append(now)
+            sub.queue.clear()
+            sub.queued = 0
+            if len(sub.lags) > self.max_lags:
+                sub.dropped = True
+                metrics.registry.inc("werewolf_spectator_drops_total")
+            else:
+                sub.stale = True
+                metrics.registry.inc("werewolf_spectator_lags_total")
+            self.dirty.add(sub)
+            return True
+        sub.queue.append(data)
+        sub.queued += len(data)
+        if sub.queued == len(data):
+            self.dirty.add(sub)
+            return True
+        return False
+
+    def wake(self):
+        try:
+            self.wakeup_writer.send(b"\0")
+        except OSError:
+            # 缓冲区已满说明已有未处理的唤醒
+            pass
+
+    def run(self):
+        while True:
+            for key, events in self.selector.select():
+                if key.data == "accept":
+                    self.accept()
+                elif key.data == "wakeup":
+                    try:
+                        self.wakeup_reader.recv(4096)
+                    except BlockingIOError:
+                        pass
+                else:
+                    # 同一批事件中可能已被断开
+                    sub = key.data
+                    if events & selectors.EVENT_READ and sub.sock:
+                        self.read(sub)
+                    if events & selectors.EVENT_WRITE and sub.sock:
+                        self.flush(sub)
+            with self.lock:
+                dirty, self.dirty = self.dirty, set()
+            for sub in dirty:
+                if sub.sock:
+                    self.flush(sub)
+
+    def accept(self):
+        while True:
+            try:
+                sock, addr = self.server.accept()
+            except BlockingIOError:
+                return
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ, Subscriber(sock))
+
+    def read(self, sub):
+        try:
+            data = sub.sock.recv(4096)
+            messages = sub.decoder.feed(data) if data else None
+        except BlockingIOError:
+            return
+        except (OSError, ValueError):
+            messages = None
+        if messages is None:
+            self.close(sub)
+            return
+        for message in messages:
+            if sub.view is None:
+                self.subscribe(sub, message)
+            elif message.get("type") == "resync":
+                with self.lock:
+                    self.enqueue(sub, self.catch_up(sub))
+
+    def subscribe(self, sub, hello):
+        """
+        握手：按请求确定视角和编码，依次回复 welcome、座位表和当前状态快照
+        """
+        if hello.get("type") != "spectate":
+            self.close(sub)
+            return
+        view = self.authorize(hello)
+        codec = make_codec(hello.get("codec"))
+        with self.lock:
+            sub.view = view
+            sub.codec = self.codecs.get(codec.name)
+            if sub.codec is None:
+                sub.codec = self.codecs[codec.name] = codec
+                if self.roster:
+                    codec.set_roster(self.roster)
+            # welcome 固定用 JSON 编码
+            self.enqueue(sub, encode_message({"type": "welcome", "codec": codec.name, "view": view}))
+            self.enqueue(sub, self.catch_up(sub))
+            sub.decoder.codec = make_codec(codec.name)
+            self.subscribers.add(sub)
+            self.dirty.add(sub)
+        print(f"观众已连接（{'上帝' if view == GOD else '公开'}视角）")
+
+    def flush(self, sub):
+        """
+        发送线程调用：每次取出整个队列拼成一块非阻塞地写出，写不完的部分等连接可写时继续。
+        网络写入不持有锁，游戏线程发布消息不会被发送阻塞
+        """
+        while True:
+            if not sub.sending:
+                with self.lock:
+                    if sub.dropped:
+                        break
+                    if sub.stale:
+                        sub.stale = False
+                        data = self.catch_up(sub)
+                    else:
+                        data = b"".join(sub.queue)
+                    sub.queue.clear()
+                    sub.queued = 0
+                if not data:
+                    break
+                sub.sending = memoryview(data)
+            try:
+                sent = sub.sock.send(sub.sending)
+            except BlockingIOError:
+                break
+            except OSError:
+                sub.dropped = True
+                break
+            metrics.registry.inc("werewolf_sent_bytes_total", sent)
+            sub.sending = sub.sending[sent:]
+            if sub.sending:
+                break
+        if sub.dropped:
+            self.close(sub)
+            return
+        with self.lock:
+            events = selectors.EVENT_READ
+            if sub.sending or sub.queue or sub.stale:
+                events |= selectors.EVENT_WRITE
+            if events != sub.events:
+                sub.events = events
+                self.selector.modify(sub.sock, events, sub)
+
+    def close(self, sub):
+        # 只在发送线程中调用，selector 只由发送线程修改
+        with self.lock:
+            if sub.sock is None:
+                return
+            self.subscribers.discard(sub)
+            self.dirty.discard(sub)
+            sub.dropped = True
+            sub.queue.clear()
+            sub.queued = 0
+            try:
+                self.selector.unregister(sub.sock)
+            except (KeyError, ValueError):
+                pass
+            sub.sock.close()
+            sub.sock = None
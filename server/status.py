@@ -0,0 +1,77 @@
+import threading
+from protocol import frame, JSON
+from game import seats_of
+
+
+class StatusTracker:
+    """
+    带版本号的游戏状态：开局或重新同步时发送完整快照，之后每个事件只广播变化的部分。
+    变化项都是绝对值（某座位存活/警长标记、当前天数），重复应用不会出错。
+    快照按上次广播时记下的状态生成，与所带的版本号一致；观战线程、重连线程也会生成快照，
+    版本号、记下的状态和快照缓存由 lock 保护，游戏线程换版本时同样持有
+    """
+    def __init__(self, game):
+        self.game = game
+        self.lock = threading.Lock()
+        self.version = 0
+        # 上次广播时的存活、警长位集，与当前位集异或即得变化的座位
+        self.alive = 0
+        self.sheriff = 0
+        self.day_count = None
+        self.class_bodies = {}
+        self.capture()
+
+    def capture(self):
+        self.alive = self.game.alive_mask
+        self.sheriff = self.game.sheriff_mask
+        self.day_count = self.game.day_count
+        self.class_bodies.clear()
+
+    def visibility_class(self, player):
+        # 可见性类别就是该玩家的 knows 位集：狼人共享狼人位集，其他玩家为 0（自己的身份由客户端按 seat 填回）
+        return self.game.knows[player.seat]
+
+    def class_body(self, view, codec):
+        """
+        同一可见性类别（及编码方式）的所有玩家共用的快照部分，每个版本只序列化一次
+        """
+        with self.lock:
+            body = self.class_bodies.get((view, codec.name))
+            if body is None:
+                rows = [(p.name, p.role.name if view >> p.seat & 1 else "未知",
+                         bool(self.alive >> p.seat & 1), bool(self.sheriff >> p.seat & 1))
+                        for p in self.game.players]
+                body = codec.encode_fields({"players": rows, "day_count": self.day_count, "version": self.version})
+                self.class_bodies[(view, codec.name)] = body
+            return body
+
+    def snapshot(self, player, codec=JSON):
+        # 只为每个玩家单独序列化消息头（消息类型、自己的角色和座位），再拼上类别共用部分
+        head = codec.encode_fields({"type": "game_status", "role": player.role.name, "seat": player.seat})
+        return frame(codec.join_fields([head, self.class_body(self.visibility_class(player), codec)], 6))
+
+    def spectator_snapshot(self, view, codec=JSON):
+        # 观众没有座位：上帝视角的类别为全部座位，公开视角与不知道任何身份的好人相同
+        head = codec.encode_fields({"type": "game_status", "role": "观众"})
+        return frame(codec.join_fields([head, self.class_body(view, codec)], 5))
+
+    def delta(self):
+        game = self.game
+        changes = []
+        for seat in seats_of(game.alive_mask ^ self.alive):
+            changes.append(["alive", seat, bool(game.alive_mask >> seat & 1)])
+        for seat in seats_of(game.sheriff_mask ^ self.sheriff):
+            changes.append(["sheriff", seat, bool(game.sheriff_mask >> seat & 1)])
+        if self.game.day_count != self.day_count:
+            changes.append(["day_count", self.game.day_count])
+        if not changes:
+            return None
+        with self.lock:
+            self.version += 1
+            self.capture()
+        return {
+            "type": "status_delta",
+            "base": self.version - 1,
+            "version": self.version,
+            "changes": changes,
+        }
@@ -0,0 +1,242 @@
+import argparse
+import math
+import time
+import numpy as np
+import roles
+from simulate import MAX_DAYS, SimulationStats, simulate
+
+# 角色编号，与 WerewolfGame.random_allocate 的配置对应
+VILLAGER, WOLF, SEER, WITCH, HUNTER = range(5)
+ROLE_NAMES = [role.name for role in (roles.VILLAGER, roles.WOLF, roles.SEER, roles.WITCH, roles.HUNTER)]
+
+NO_WINNER, VILLAGERS_WIN, WOLVES_WIN = range(3)
+WITCH_SAVE_CHANCE = 0.7
+WITCH_POISON_CHANCE = 0.3
+
+
+class VectorGames:
+    """
+    用数组同时表示 N 局游戏：每行一局，每列一个座位。
+    规则与 game.py / roles.py 中的 AI 对局流程（simulate.play_match）保持一致
+    """
+    def __init__(self, num_games, num_players, rng):
+        self.rng = rng
+        self.n = num_games
+        self.p = num_players
+        self.rows = np.arange(num_games)
+
+        werewolf_count = 2 if num_players >= 5 else 1
+        base = np.full(num_players, VILLAGER, dtype=np.int8)
+        base[:werewolf_count] = WOLF
+        base[werewolf_count] = SEER
+        base[werewolf_count + 1] = WITCH
+        self.roles = base[np.argsort(rng.random((num_games, num_players)), axis=1)]
+        self.is_wolf = self.roles == WOLF
+
+        self.alive = np.ones((num_games, num_players), dtype=bool)
+        self.votes = np.zeros((num_games, num_players), dtype=np.int64)
+        self.has_antidote = np.ones(num_games, dtype=bool)
+        self.has_poison = np.ones(num_games, dtype=bool)
+        self.sheriff = np.full(num_games, -1, dtype=np.int16)
+        self.sheriff_flags = np.zeros((num_games, num_players), dtype=bool)
+        self.seer_checked = np.zeros((num_games, num_players), dtype=bool)
+        self.day_count = np.ones(num_games, dtype=np.int16)
+        self.winner = np.full(num_games, NO_WINNER, dtype=np.int8)
+        self.finished = np.zeros(num_games, dtype=bool)
+
+    def choose(self, mask):
+        # 每行在 mask 为真的位置中均匀随机选一个，返回 (下标, 该行是否有可选项)
+        keys = self.rng.random(mask.shape, dtype=np.float32)
+        keys[~mask] = -1.0
+        return keys.argmax(axis=-1), mask.any(axis=-1)
+
+    def tally(self, voters, targets):
+        # voters: (N, P) 谁投票; targets: (N, P) 每个投票者的目标
+        index = (self.rows[:, None] * self.p + targets)[voters]
+        return np.bincount(index, minlength=self.n * self.p).reshape(self.n, self.p)
+
+    def cast_votes(self, voters, allowed):
+        # allowed: (N, P, P) 每个投票者可投的目标
+        choice, has_choice = self.choose(allowed)
+        self.votes = self.tally(voters & has_choice, choice)
+        return self.votes
+
+    def active(self):
+        return ~self.finished
+
+    def night(self, active):
+        # 各角色的行动先记为意图，最后按击杀、解药、毒药的顺序一次结算
+        # 狼人：每只存活狼人随机投一名存活好人，票数最高者中随机选定击杀目标
+        voters = self.alive & self.is_wolf & active[:, None]
+        allowed = np.broadcast_to((self.alive & ~self.is_wolf)[:, None, :], (self.n, self.p, self.p))
+        votes = self.cast_votes(voters, allowed)
+        top = votes.max(axis=1)
+        victim, _ = self.choose((votes == top[:, None]) & (votes > 0))
+        kill = active & (top > 0)
+
+        # 预言家：查验一名其他存活玩家，只影响预言家掌握的信息
+        seers = self.alive & (self.roles == SEER) & active[:, None]
+        others = self.alive & ~(self.roles == SEER)
+        target, has_target = self.choose(others)
+        check = seers.any(axis=1) & has_target
+        self.seer_checked[self.rows[check], target[check]] = True
+
+        # 女巫得知击杀目标：先尝试解药（只能救今晚的目标），未使用解药时才考虑毒药
+        witch_alive = (self.alive & (self.roles == WITCH)).any(axis=1)
+        can_save = kill & witch_alive & self.has_antidote
+        save = can_save & (self.rng.random(self.n) < WITCH_SAVE_CHANCE)
+        self.has_antidote[save] = False
+
+        alive_wolves = self.alive & self.is_wolf
+        can_poison = active & witch_alive & ~save & self.has_poison & alive_wolves.any(axis=1)
+        poison = can_poison & (self.rng.random(self.n) < WITCH_POISON_CHANCE)
+        target, _ = self.choose(alive_wolves)
+        self.has_poison[poison] = False
+
+        dies = kill & ~save
+        self.alive[self.rows[dies], victim[dies]] = False
+        self.alive[self.rows[poison], target[poison]] = False
+
+    def elect_sheriff(self, active):
+        electing = active & (self.sheriff < 0)
+        voters = self.alive & electing[:, None]
+        allowed = np.broadcast_to(self.alive[:, None, :], (self.n, self.p, self.p))
+        votes = self.cast_votes(voters, allowed)
+        votes[~self.alive] = -1
+        top = votes.max(axis=1)
+        leaders = votes == top[:, None]
+        # 首轮平票后票数清零，只有仅剩一名存活玩家时才能在后续轮次当选
+        unique = leaders.sum(axis=1) == 1
+        sole_survivor = self.alive.sum(axis=1) == 1
+        elected = electing & (unique | sole_survivor)
+        winner = np.where(unique, leaders.argmax(axis=1), self.alive.argmax(axis=1))
+        self.sheriff[elected] = winner[elected]
+        self.sheriff_flags[self.rows[elected], winner[elected]] = True
+
+    def day(self, active):
+        self.elect_sheriff(active)
+        self.day_count[active] += 1
+
+        voters = self.alive & active[:, None]
+        allowed = self.alive[:, None, :] & ~np.eye(self.p, dtype=bool)[None, :, :]
+        votes = self.cast_votes(voters, allowed)
+        votes[~self.alive] = -1
+        top = votes.max(axis=1)
+        leaders = votes == top[:, None]
+        out = active & (leaders.sum(axis=1) == 1)
+        killed = leaders.argmax(axis=1)
+        self.alive[self.rows[out], killed[out]] = False
+
+        # 被投出的警长移交警徽（继承人不能是已有警徽标记的玩家）
+        transfer = out & self.sheriff_flags[self.rows, killed]
+        target, has_target = self.choose(self.alive & ~self.sheriff_flags)
+        transfer &= has_target
+        self.sheriff[transfer] = target[transfer]
+        self.sheriff_flags[self.rows[transfer], target[transfer]] = True
+
+    def check_game_end(self, active):
+        wolves = (self.alive & self.is_wolf).sum(axis=1)
+        villagers = (self.alive & ~self.is_wolf).sum(axis=1)
+        villagers_win = active & (wolves == 0)
+        wolves_win = active & ~villagers_win & (wolves >= villagers)
+        self.winner[villagers_win] = VILLAGERS_WIN
+        self.winner[wolves_win] = WOLVES_WIN
+        self.finished |= villagers_win | wolves_win
+
+    def run(self):
+        while True:
+            active = self.active() & (self.day_count <= MAX_DAYS)
+            if not active.any():
+                break
+            self.night(active)
+            self.check_game_end(active)
+            active &= self.active()
+            self.day(active)
+            self.check_game_end(active)
+
+    def stats(self):
+        stats = SimulationStats()
+        stats.games = self.n
+        sides = {NO_WINNER: "unfinished", VILLAGERS_WIN: "villagers", WOLVES_WIN: "wolves"}
+        for side, count in zip(*np.unique(self.winner, return_counts=True)):
+            stats.wins[sides[int(side)]] += int(count)
+        for day, count in zip(*np.unique(self.day_count, return_counts=True)):
+            stats.lengths[int(day)] += int(count)
+        for role_id in np.unique(self.roles):
+            mask = self.roles == role_id
+            stats.role_games[ROLE_NAMES[role_id]] += int(mask.sum())
+            stats.role_survivors[ROLE_NAMES[role_id]] += int((mask & self.alive).sum())
+        return stats
+
+
+def simulate_vectorized(num_games, num_players=8, batch_size=100000, seed=None):
+    rng = np.random.default_rng(seed)
+    stats = SimulationStats()
+    for start in range(0, num_games, batch_size):
+        games = VectorGames(min(batch_size, num_games - start), num_players, rng)
+        games.run()
+        stats.merge(games.stats())
+    return stats
+
+
+def check_against_scalar(num_games, num_players=8, seed=None):
+    """
+    用同样的对局数分别跑向量化模拟和逐对象模拟，比较胜率、平均天数和角色存活率，
+    差异超过 4 倍标准误即视为规则不一致
+    """
+    vector = simulate_vectorized(num_games, num_players, seed=seed).as_dict()
+    scalar = simulate(num_games, num_players, seed=seed).as_dict()
+    mismatches = []
+
+    def compare(label, a, b, std):
+        if abs(a - b) > 4 * std:
+            mismatches.append(f"{label}: 向量化 {a:.4f} / 逐对象 {b:.4f}")
+
+    for side in set(vector["win_rate"]) | set(scalar["win_rate"]):
+        a, b = vector["win_rate"].get(side, 0.0), scalar["win_rate"].get(side, 0.0)
+        rate = (a + b) / 2
+        compare(f"胜率[{side}]", a, b, math.sqrt(2 * max(rate * (1 - rate), 1e-4) / num_games))
+    for role in scalar["role_survival"]:
+        a, b = vector["role_survival"].get(role, 0.0), scalar["role_survival"][role]
+        rate = (a + b) / 2
+        compare(f"存活率[{role}]", a, b, math.sqrt(2 * max(rate * (1 - rate), 1e-4) / num_games))
+    lengths = scalar["length_histogram"]
+    mean = scalar["mean_length"]
+    variance = sum(count * (day - mean) ** 2 for day, count in lengths.items()) / num_games
+    compare("平均天数", vector["mean_length"], mean, math.sqrt(2 * max(variance, 1e-4) / num_games))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="狼人杀向量化批量模拟")
+    parser.add_argument("--games", type=int, default=1000000)
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--check", type=int, default=0, metavar="GAMES",
+                        help="用指定局数与逐对象模拟对比规则是否一致")
+    args = parser.parse_args()
+
+    if args.check:
+        mismatches = check_against_scalar(args.check, args.players, args.seed)
+        if mismatches:
+            print("与逐对象模拟结果不一致:")
+            for line in mismatches:
+                print("  " + line)
+            raise SystemExit(1)
+        print(f"{args.check} 局对比通过，向量化模拟与逐对象模拟一致")
+        return
+
+    started = time.perf_counter()
+    stats = simulate_vectorized(args.games, args.players, args.batch_size, args.seed)
+    elapsed = time.perf_counter() - started
+
+    result = stats.as_dict()
+    print(f"对局数: {result['games']}  耗时: {elapsed:.2f}s  ({result['games'] / elapsed:.0f} 局/秒)")
+    print("胜率:", {side: f"{rate:.3f}" for side, rate in result["win_rate"].items()})
+    print(f"平均天数: {result['mean_length']:.2f}")
+    print("角色存活率:", {role: f"{rate:.3f}" for role, rate in result["role_survival"].items()})
+
+
+if __name__ == "__main__":
+    main()
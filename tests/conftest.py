@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 服务端模块按扁平方式互相导入，测试与服务端脚本一样把 server/ 放进模块搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
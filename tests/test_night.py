@@ -0,0 +1,132 @@
+from game import WerewolfGame
+from models import Player
+from roles import WOLF, VILLAGER, WITCH, SEER, HUNTER
+
+
+def make_game():
+    # 固定座位：0 狼人，1 女巫，2 预言家，3 猎人，4、5 平民
+    game = WerewolfGame(seed=1)
+    game.log = lambda *args: None
+    for i in range(6):
+        game.add_player(Player(f"P{i}", is_ai=True))
+    game.assign_roles([WOLF, WITCH, SEER, HUNTER, VILLAGER, VILLAGER])
+    game.begin_night()
+    return game
+
+
+def test_kill_without_potions():
+    game = make_game()
+    wolf, witch, seer, hunter, villager, _ = game.players
+    game.set_wolf_kill(villager)
+    assert witch.state.victim == villager.name
+    assert game.resolve_night() == 1 << villager.seat
+    assert not villager.alive
+    assert witch.state.has_antidote and witch.state.has_poison
+
+
+def test_save_cancels_kill():
+    game = make_game()
+    wolf, witch, seer, hunter, villager, _ = game.players
+    game.set_wolf_kill(villager)
+    assert game.intend("save", witch, villager)
+    assert game.resolve_night() == 0
+    assert villager.alive
+    assert not witch.state.has_antidote and witch.state.has_poison
+
+
+def test_save_only_tonights_target():
+    game = make_game()
+    wolf, witch, seer, hunter, villager, other = game.players
+    game.set_wolf_kill(villager)
+    assert not game.intend("save", witch, other)
+    assert game.resolve_night() == 1 << villager.seat
+    assert witch.state.has_antidote
+
+
+def test_poison_applies_after_save():
+    # 解药先于毒药结算：同一晚救下的人再被毒，仍然死亡，两瓶药都用掉
+    game = make_game()
+    wolf, witch, seer, hunter, villager, _ = game.players
+    game.set_wolf_kill(villager)
+    assert game.intend("save", witch, villager)
+    assert game.intend("poison", witch, villager)
+    assert game.resolve_night() == 1 << villager.seat
+    assert not witch.state.has_antidote and not witch.state.has_poison
+
+
+def test_intents_do_not_change_state_before_resolve():
+    game = make_game()
+    wolf, witch, seer, hunter, villager, other = game.players
+    game.set_wolf_kill(villager)
+    game.intend("poison", witch, other)
+    assert villager.alive and other.alive
+    assert witch.state.has_poison
+    assert game.resolve_night() == 1 << villager.seat | 1 << other.seat
+
+
+def test_one_potion_of_each_kind_per_night():
+    game = make_game()
+    wolf, witch, seer, hunter, villager, other = game.players
+    game.set_wolf_kill(villager)
+    assert game.intend("save", witch, villager)
+    assert not game.intend("save", witch, villager)
+    assert game.intend("poison", witch, other)
+    assert not game.intend("poison", witch, seer)
+    assert game.night.poison == (witch.seat, other.seat)
+
+
+def test_used_potions_are_rejected_on_later_nights():
+    game = make_game()
+    wolf, witch, seer, hunter, villager, other = game.players
+    game.set_wolf_kill(villager)
+    game.intend("save", witch, villager)
+    game.intend("poison", witch, other)
+    game.resolve_night()
+
+    game.begin_night()
+    game.set_wolf_kill(villager)
+    assert not game.intend("save", witch, villager)
+    assert not game.intend("poison", witch, seer)
+    assert game.resolve_night() == 1 << villager.seat
+    assert seer.alive
+
+
+def test_poison_needs_living_target():
+    game = make_game()
+    wolf, witch, seer, hunter, villager, other = game.players
+    game.kill(other)
+    assert not game.intend("poison", witch, other)
+    assert witch.state.has_poison
+
+
+def test_hunter_shoots_after_wolf_kill():
+    game = make_game()
+    wolf, witch, seer, hunter, villager, _ = game.players
+    game.set_wolf_kill(hunter)
+    game.resolve_night()
+    assert game.hunter_triggered(hunter)
+    assert game.intend("shoot", hunter, wolf)
+    game.resolve_shots()
+    assert not wolf.alive
+
+
+def test_poisoned_hunter_cannot_shoot():
+    game = make_game()
+    wolf, witch, seer, hunter, villager, _ = game.players
+    game.set_wolf_kill(hunter)
+    game.intend("save", witch, hunter)
+    game.intend("poison", witch, hunter)
+    game.resolve_night()
+    assert not hunter.alive
+    assert not game.hunter_triggered(hunter)
+    assert not game.intend("shoot", hunter, wolf)
+
+
+def test_saved_hunter_cannot_shoot():
+    game = make_game()
+    wolf, witch, seer, hunter, villager, _ = game.players
+    game.set_wolf_kill(hunter)
+    game.intend("save", witch, hunter)
+    game.resolve_night()
+    assert hunter.alive
+    assert not game.hunter_triggered(hunter)
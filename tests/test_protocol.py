@@ -0,0 +1,107 @@
+import pytest
+
+from protocol import BinaryCodec, FrameDecoder, JsonCodec, decode_message, encode_message, make_codec
+
+NAMES = ["玩家1", "玩家2", "AI1", "AI2", "AI3", "AI4"]
+
+# 服务端和客户端之间收发的每一种消息
+MESSAGES = [
+    {"name": "玩家1", "codec": "binary"},
+    {"name": "玩家1", "token": "a1b2c3", "codec": "binary"},
+    {"type": "welcome", "codec": "binary", "token": "a1b2c3"},
+    {"type": "welcome", "codec": "binary", "token": "a1b2c3", "resumed": True},
+    {"type": "reconnect_rejected"},
+    {"type": "room_joined", "room": 3, "size": 2, "players": ["玩家1"]},
+    {"type": "wait_confirm", "players": ["玩家1", "玩家2"]},
+    {"confirm": True},
+    {"type": "game_cancelled"},
+    {"type": "roster", "players": NAMES},
+    {"type": "game_status", "role": "女巫", "seat": 0, "day_count": 1, "version": 0,
+     "players": [[name, "未知", True, False] for name in NAMES]},
+    {"type": "status_delta", "base": 4, "version": 5,
+     "changes": [["alive", 2, False], ["sheriff", 1, True], ["day_count", 3]]},
+    {"type": "resync"},
+    {"type": "sheriff_election", "candidates": NAMES},
+    {"vote": "AI3"},
+    {"type": "day_vote", "candidates": NAMES[1:]},
+    {"vote": None},
+    {"type": "night_action", "action": "werewolf", "candidates": ["AI1", "AI2"]},
+    {"target": "AI1"},
+    {"type": "night_action", "action": "witch", "has_poison": True, "has_antidote": False,
+     "wolf_target": None, "alive_players": NAMES[1:]},
+    {"save": "AI1", "poison": "AI2"},
+    {"type": "night_action", "action": "seer", "candidates": NAMES[1:]},
+    {"type": "seer_result", "action": "seer", "target": "AI4", "result": "好人"},
+    {"type": "night_action", "action": "hunter", "candidates": NAMES[:2]},
+    {"type": "spectate", "view": "public", "codec": "json"},
+    {"type": "game_event", "event": ["vote", 0, 3, 1.5]},
+    {"type": "game_end", "winner": "好人", "day_count": -2},
+]
+
+
+def pair(name):
+    # 收发双方各一个编解码器，先像服务端开局时一样下发座位表：座位表按旧座位表编码，发送后发送方才启用
+    sender, receiver = make_codec(name), make_codec(name)
+    decode_message(sender.encode({"type": "roster", "players": NAMES}), receiver)
+    sender.set_roster(NAMES)
+    return sender, receiver
+
+
+@pytest.mark.parametrize("codec_name", ["json", "binary"])
+@pytest.mark.parametrize("message", MESSAGES, ids=lambda m: m.get("type", "reply"))
+def test_round_trip(codec_name, message):
+    sender, receiver = pair(codec_name)
+    assert decode_message(sender.encode(message), receiver) == message
+
+
+@pytest.mark.parametrize("codec_name", ["json", "binary"])
+def test_frames_split_across_reads(codec_name):
+    # welcome 会让解码器切换编码，见 test_welcome_switches_codec
+    sender, receiver = pair(codec_name)
+    messages = [message for message in MESSAGES if message.get("type") != "welcome"]
+    data = b"".join(encode_message(message, sender) for message in messages)
+    decoder = FrameDecoder(receiver)
+    received = []
+    for i in range(0, len(data), 7):
+        received += decoder.feed(data[i:i + 7])
+    assert received == messages
+    assert decoder.dropped == 0
+
+
+def test_welcome_switches_codec():
+    binary = BinaryCodec()
+    decoder = FrameDecoder()
+    data = encode_message({"type": "welcome", "codec": "binary", "token": "t"})
+    data += encode_message({"type": "resync"}, binary)
+    assert decoder.feed(data) == [{"type": "welcome", "codec": "binary", "token": "t"}, {"type": "resync"}]
+    assert isinstance(decoder.codec, BinaryCodec)
+
+
+@pytest.mark.parametrize("codec_name", ["json", "binary"])
+def test_joined_fields(codec_name):
+    # 快照由单独编码的字段拼接而成，解码结果应与整体编码一致
+    sender, receiver = pair(codec_name)
+    head = sender.encode_fields({"type": "game_status", "role": "狼人", "seat": 1})
+    body = sender.encode_fields({"players": [["AI1", "狼人", True, False]], "day_count": 2, "version": 7})
+    assert decode_message(sender.join_fields([head, body], 6), receiver) == {
+        "type": "game_status", "role": "狼人", "seat": 1,
+        "players": [["AI1", "狼人", True, False]], "day_count": 2, "version": 7,
+    }
+
+
+def test_binary_is_smaller():
+    sender, _ = pair("binary")
+    message = MESSAGES[10]
+    assert len(sender.encode(message)) < len(JsonCodec().encode(message))
+
+
+@pytest.mark.parametrize("codec", [JsonCodec(), BinaryCodec()], ids=["json", "binary"])
+def test_rejects_non_object(codec):
+    with pytest.raises(ValueError):
+        decode_message(codec.encode([1, 2]), codec)
+
+
+def test_rejects_truncated_binary():
+    body = BinaryCodec().encode(MESSAGES[5])
+    with pytest.raises(ValueError):
+        BinaryCodec().decode(body[:-3])